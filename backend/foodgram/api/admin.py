@@ -1,6 +1,49 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Aggregate, CharField, OuterRef, Subquery
+from django.utils.functional import cached_property
 
-from .models import Cart, Favorite, Ingredient, IngredientAmount, Recipe, Tag
+from .models import (Cart, Favorite, Ingredient, IngredientAmount, Recipe,
+                     ShoppingListItem, Tag)
+
+
+class GroupConcat(Aggregate):
+    function = 'GROUP_CONCAT'
+    template = "%(function)s(%(expressions)s, ', ')"
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, function='STRING_AGG', **extra_context)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Для большой таблицы без фильтров берёт оценку числа строк
+    из статистики PostgreSQL вместо COUNT(*)."""
+    EXACT_COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if connection.vendor == 'postgresql' and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [query.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > self.EXACT_COUNT_LIMIT:
+                return int(row[0])
+        return super().count
+
+
+def names_subquery(queryset, field):
+    return Subquery(
+        queryset.filter(recipe=OuterRef('pk')).order_by()
+        .values('recipe').annotate(names=GroupConcat(field))
+        .values('names'),
+        output_field=CharField(),
+    )
 
 
 class IngredientInRecipeAdmin(admin.TabularInline):
@@ -14,28 +57,40 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'author', 'name', 'favorited',
                     'in_cart', 'get_tags', 'get_ingredients')
     list_display_links = list_display
-    list_filter = ('author', 'name', 'tags')
+    list_filter = ('tags',)
     list_select_related = ('author',)
+    search_fields = ('name', 'author__username', 'author__email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     inlines = [
         IngredientInRecipeAdmin
     ]
-    autocomplete_fields = ['tags']
+    autocomplete_fields = ['author', 'tags']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            tag_names=names_subquery(Recipe.tags.through.objects, 'tag__name'),
+            ingredient_names=names_subquery(
+                IngredientAmount.objects, 'ingredient__name'),
+        )
 
     def favorited(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
     favorited.short_description = 'Added to favorite, times'
+    favorited.admin_order_field = 'favorites_count'
 
     def in_cart(self, obj):
-        return Cart.objects.filter(recipe=obj).count()
+        return obj.carts_count
     in_cart.short_description = 'Added to cart, times'
+    in_cart.admin_order_field = 'carts_count'
 
     def get_ingredients(self, obj):
-        return obj.list_ingredients()
+        return obj.ingredient_names
     get_ingredients.short_description = 'Names of ingredients'
 
     def get_tags(self, obj):
-        return obj.list_tags()
+        return obj.tag_names
     get_tags.short_description = 'Names of tags'
 
 
@@ -64,3 +119,9 @@ class FavoriteAdmin(admin.ModelAdmin):
 @admin.register(IngredientAmount)
 class RecipeIngredientAmountAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    list_select_related = ('user', 'ingredient')
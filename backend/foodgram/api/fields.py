@@ -0,0 +1,48 @@
+import hashlib
+
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from .images import variant_urls
+
+
+class HashedBase64ImageField(Base64ImageField):
+    """Base64ImageField, сохраняющий файл под именем из хеша содержимого.
+
+    Если такой файл уже есть в хранилище, повторно он не записывается:
+    поле возвращает имя существующего файла.
+    """
+
+    def get_file_name(self, decoded_file):
+        return hashlib.sha256(decoded_file).hexdigest()
+
+    def to_internal_value(self, base64_data):
+        image = super().to_internal_value(base64_data)
+        if image is None:
+            return image
+        model_field = self.parent.Meta.model._meta.get_field(self.source)
+        name = model_field.generate_filename(None, image.name)
+        if model_field.storage.exists(name):
+            return name
+        return image
+
+
+def represent_variants(name, request=None):
+    """URL уменьшенных копий; абсолютные, если передан request."""
+    urls = variant_urls(name)
+    if request is None:
+        return urls
+    return {
+        variant: {image_format: request.build_absolute_uri(url)
+                  for image_format, url in formats.items()}
+        for variant, formats in urls.items()
+    }
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URL уменьшенных копий изображения в WebP и JPEG."""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return represent_variants(value.name, self.context.get('request'))
@@ -1,11 +1,28 @@
 import django_filters as filters
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from rest_framework.filters import OrderingFilter
 
 from .models import Ingredient, Recipe, Tag
+from .utils.cache import get_version
 
 User = get_user_model()
 
 
+def get_tag_ids():
+    """slug -> id всех тегов. Кешируется под версией 'tags', которую
+    сигналы меняют при изменении тегов."""
+    return cache.get_or_set(
+        f'tags:ids:{get_version("tags")}',
+        lambda: dict(Tag.objects.values_list('slug', 'id')),
+        None)
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
+
+
 class IngredientNameFilter(filters.FilterSet):
     name = filters.CharFilter(field_name='name', lookup_expr='istartswith')
 
@@ -21,10 +38,9 @@ class RecipeFilter(filters.FilterSet):
         (IN, 1),
         (OUT, 0),
     )
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        queryset=Tag.objects.all(),
-        to_field_name='slug')
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='get_tags')
 
     is_favorited = filters.ChoiceFilter(
         method='get_is_favorited',
@@ -40,10 +56,19 @@ class RecipeFilter(filters.FilterSet):
         model = Recipe
         fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
 
+    def get_tags(self, queryset, name, value):
+        """EXISTS по связующей таблице вместо JOIN: рецепт с несколькими
+        подходящими тегами не дублируется, DISTINCT не нужен."""
+        if not value:
+            return queryset
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[tag_ids[slug] for slug in value if slug in tag_ids],
+        )))
+
     def get_is_favorited(self, queryset, name, value):
         user = self.request.user
-        print(value)
-
         if value:
             return queryset.filter(favorites__user=user)
         return queryset
@@ -53,3 +78,19 @@ class RecipeFilter(filters.FilterSet):
         if value:
             return queryset.filter(purchase__user=user)
         return queryset
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Дополняет сортировку полями -pub_date и -id, чтобы порядок был
+    однозначным: у многих рецептов одинаковый favorites_count, и без
+    них строки на границах страниц повторялись бы или пропадали."""
+    TIEBREAKERS = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        fields = {field.lstrip('-') for field in ordering}
+        return (*ordering, *(
+            field for field in self.TIEBREAKERS
+            if field.lstrip('-') not in fields))
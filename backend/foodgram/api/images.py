@@ -0,0 +1,101 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/variants'
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+_executor = ThreadPoolExecutor(
+    max_workers=max(settings.IMAGE_VARIANT_WORKERS, 1),
+    thread_name_prefix='image-variants',
+)
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def variant_name(name, variant, image_format):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{VARIANTS_DIR}/{stem}_{variant}.{image_format}'
+
+
+def variant_urls(name):
+    """URL всех уменьшенных копий изображения: {вариант: {формат: url}}."""
+    return {
+        variant: {
+            image_format: default_storage.url(
+                variant_name(name, variant, image_format))
+            for image_format in FORMATS
+        }
+        for variant in settings.IMAGE_VARIANTS
+    }
+
+
+def to_rgb(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def build_variants(name):
+    """Создаёт недостающие уменьшенные копии в WebP и JPEG."""
+    missing = [
+        (variant, image_format)
+        for variant in settings.IMAGE_VARIANTS
+        for image_format in FORMATS
+        if not default_storage.exists(
+            variant_name(name, variant, image_format))
+    ]
+    if not missing:
+        return
+    with default_storage.open(name) as f:
+        original = Image.open(f)
+        original.load()
+    resized = {}
+    for variant, image_format in missing:
+        if variant not in resized:
+            size = settings.IMAGE_VARIANTS[variant]
+            resized[variant] = original.copy()
+            resized[variant].thumbnail((size, size), Image.LANCZOS)
+        image = resized[variant]
+        if FORMATS[image_format] == 'JPEG':
+            image = to_rgb(image)
+        buffer = io.BytesIO()
+        image.save(buffer, FORMATS[image_format], quality=80, optimize=True)
+        target = variant_name(name, variant, image_format)
+        if not default_storage.exists(target):
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def _build_variants_safe(name):
+    try:
+        build_variants(name)
+    except Exception:
+        logger.exception('Could not build image variants for %s', name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def schedule_variants(name):
+    """Ставит сборку копий в пул потоков, чтобы не задерживать запрос.
+    При IMAGE_VARIANT_WORKERS = 0 копии собираются сразу."""
+    with _pending_lock:
+        if not name or name in _pending:
+            return
+        _pending.add(name)
+    if settings.IMAGE_VARIANT_WORKERS <= 0:
+        _build_variants_safe(name)
+        return
+    _executor.submit(_build_variants_safe, name)
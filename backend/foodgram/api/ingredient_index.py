@@ -0,0 +1,74 @@
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from functools import partial
+
+from django.db import transaction
+
+from .models import Ingredient
+from .utils.cache import bump_version, get_version
+
+MAX_CHAR = chr(0x10FFFF)
+
+
+def fold(value):
+    """Приводит строку к виду для поиска: регистр, NFKC и ё -> е."""
+    return unicodedata.normalize('NFKC', value).casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Отсортированный массив свёрнутых названий, префикс ищется через
+    bisect. Индекс строится при первом обращении и перестраивается,
+    когда сигналы модели меняют версию в кеше.
+    """
+    CACHE_NAME = 'ingredients'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = (None, [], [])
+
+    @classmethod
+    def invalidate(cls):
+        transaction.on_commit(partial(bump_version, cls.CACHE_NAME))
+
+    def build(self):
+        rows = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit')
+        ]
+        rows.sort(key=lambda row: (fold(row['name']), row['id']))
+        return [fold(row['name']) for row in rows], rows
+
+    def get_state(self):
+        version = get_version(self.CACHE_NAME)
+        state = self._state
+        if state[0] == version:
+            return state
+        with self._lock:
+            if self._state[0] != version:
+                self._state = (version, *self.build())
+            return self._state
+
+    def all(self):
+        return self.get_state()[2]
+
+    def search(self, query):
+        """Точные совпадения, затем по префиксу, затем по подстроке."""
+        _, keys, rows = self.get_state()
+        key = fold(query)
+        if not key:
+            return rows
+        start = bisect_left(keys, key)
+        end = bisect_right(keys, key + MAX_CHAR, start)
+        result = rows[start:end]
+        result.extend(
+            rows[position] for position, name in enumerate(keys)
+            if key in name and not name.startswith(key)
+        )
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,86 @@
+"""Общие для benchmark и explain_queries сценарии запросов к API."""
+from contextlib import contextmanager
+
+from api.models import Recipe, Tag
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow
+
+
+def get_cases():
+    """Сценарии (имя, пользователь или None, url) основных эндпоинтов."""
+    recipe = Recipe.objects.order_by('-favorites_count').first()
+    tag = Tag.objects.first()
+    follow = Follow.objects.select_related('follower').first()
+    if recipe is None or tag is None or follow is None:
+        raise CommandError('Not enough data, run generate_data first')
+    user = follow.follower
+    return [
+        ('recipes-list', user, '/api/recipes/'),
+        ('recipes-list-tags', user, f'/api/recipes/?tags={tag.slug}'),
+        ('recipes-list-author', user,
+         f'/api/recipes/?author={recipe.author_id}'),
+        ('recipes-list-favorited', user, '/api/recipes/?is_favorited=1'),
+        ('recipes-list-in-cart', user,
+         '/api/recipes/?is_in_shopping_cart=1'),
+        ('recipes-list-popular', user,
+         '/api/recipes/?ordering=-favorites_count'),
+        ('recipes-list-cursor', user, '/api/recipes/?cursor='),
+        ('recipes-list-anonymous', None, '/api/recipes/'),
+        ('recipes-detail', user, f'/api/recipes/{recipe.id}/'),
+        ('users-subscriptions', user,
+         '/api/users/subscriptions/?recipes_limit=3'),
+        ('recipes-download-shopping-cart', user,
+         '/api/recipes/download_shopping_cart/'),
+        ('ingredients-search', None, '/api/ingredients/?name=мол'),
+    ]
+
+
+def get_client(user):
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def request(client, url):
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    if response.status_code != 200:
+        raise CommandError(f'{url} returned {response.status_code}')
+
+
+def add_database_arguments(parser):
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument(
+        '--use-existing-db',
+        action='store_true',
+        help='Не создавать тестовую БД, работать с текущими данными')
+
+
+@contextmanager
+def database(options, stdout):
+    """Временная тестовая БД с данными generate_data (для SQLite — в
+    памяти) или текущая БД при --use-existing-db."""
+    setup_test_environment()
+    old_name = None
+    try:
+        if not options['use_existing_db']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            call_command(
+                'generate_data', users=options['users'],
+                recipes=options['recipes'], stdout=stdout)
+        stdout.write(f'Database: {connection.vendor}')
+        yield
+    finally:
+        if old_name is not None:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
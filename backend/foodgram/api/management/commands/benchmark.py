@@ -0,0 +1,120 @@
+import json
+import math
+import time
+
+from api.management.commands._endpoints import (add_database_arguments,
+                                                database, get_cases,
+                                                get_client, request)
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class Command(BaseCommand):
+    """Прогоняет основные эндпоинты на синтетических данных.
+
+    По умолчанию создаёт временную тестовую БД (для SQLite — в памяти),
+    заполняет её командой generate_data и для каждого сценария выводит
+    число SQL-запросов, p50 и p95. Команда завершается ошибкой, если
+    число запросов превысило бюджет или p95 вырос относительно
+    сохранённого --baseline больше чем на --tolerance.
+    """
+    # Максимум SQL-запросов на запрос к эндпоинту.
+    BUDGETS = {
+        'recipes-list': 5,
+        'recipes-list-tags': 5,
+        'recipes-list-author': 6,
+        'recipes-list-favorited': 5,
+        'recipes-list-in-cart': 5,
+        'recipes-list-popular': 5,
+        'recipes-list-cursor': 4,
+        'recipes-list-anonymous': 5,
+        'recipes-detail': 4,
+        'users-subscriptions': 3,
+        'recipes-download-shopping-cart': 1,
+        'ingredients-search': 0,
+    }
+
+    help = 'Замеряет задержку и число запросов основных эндпоинтов.'
+
+    def add_arguments(self, parser):
+        add_database_arguments(parser)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--output', help='Сохранить результаты в JSON')
+        parser.add_argument(
+            '--baseline', help='JSON с результатами предыдущего прогона')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.25,
+            help='Допустимый рост p95 относительно --baseline')
+
+    @staticmethod
+    def percentile(values, share):
+        values = sorted(values)
+        return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+    def measure(self, client, url, iterations, warmup):
+        for _ in range(warmup):
+            request(client, url)
+        latencies = []
+        queries = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                request(client, url)
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries = max(queries, len(context.captured_queries))
+        return {
+            'queries': queries,
+            'p50': Command.percentile(latencies, 0.5),
+            'p95': Command.percentile(latencies, 0.95),
+        }
+
+    def run_cases(self, options):
+        results = {}
+        self.stdout.write(
+            f'{"endpoint":<32}{"queries":>10}{"p50, ms":>10}{"p95, ms":>10}')
+        for name, user, url in get_cases():
+            result = self.measure(
+                get_client(user), url,
+                options['iterations'], options['warmup'])
+            results[name] = result
+            self.stdout.write(
+                f'{name:<32}'
+                f'{result["queries"]:>5}/{Command.BUDGETS[name]:<4}'
+                f'{result["p50"]:>10.2f}{result["p95"]:>10.2f}')
+        return results
+
+    def find_regressions(self, results, baseline, tolerance):
+        errors = []
+        for name, result in results.items():
+            if result['queries'] > Command.BUDGETS[name]:
+                errors.append(
+                    f'{name}: {result["queries"]} queries, '
+                    f'budget {Command.BUDGETS[name]}')
+            previous = baseline.get(name)
+            if previous and result['p95'] > previous['p95'] * (
+                    1 + tolerance):
+                errors.append(
+                    f'{name}: p95 {result["p95"]:.2f} ms, '
+                    f'baseline {previous["p95"]:.2f} ms')
+        return errors
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        with database(options, self.stdout):
+            results = self.run_cases(options)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+        errors = self.find_regressions(
+            results, baseline, options['tolerance'])
+        if errors:
+            raise CommandError('\n'.join(['Budget exceeded:', *errors]))
+        self.stdout.write(self.style.SUCCESS('All budgets met.'))
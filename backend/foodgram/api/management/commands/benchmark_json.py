@@ -0,0 +1,83 @@
+import io
+import time
+
+from api.management.commands._endpoints import add_database_arguments, database
+from api.models import Ingredient, Recipe
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import IngredientSerializer, ReceipeSerializer
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+
+class Command(BaseCommand):
+    """Сравнивает FastJSONRenderer и FastJSONParser со стандартными
+    классами DRF на больших ответах: все ингредиенты и --page-size
+    рецептов. Вывод рендереров должен совпадать побайтно, результат
+    парсеров — по значению."""
+    help = 'Замеряет рендеринг и разбор JSON на больших ответах API.'
+
+    def add_arguments(self, parser):
+        add_database_arguments(parser)
+        parser.add_argument('--page-size', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson is not installed, fast classes use the json module'))
+        with database(options, self.stdout):
+            payloads = self.get_payloads(options['page_size'])
+            self.stdout.write(
+                f'{"payload":<14}{"size, KB":>10}'
+                f'{"render, ms":>20}{"parse, ms":>20}')
+            for name, data in payloads.items():
+                self.run_payload(name, data, options['iterations'])
+
+    @staticmethod
+    def get_payloads(page_size):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = AnonymousUser()
+        recipes = Recipe.objects.order_by('-pub_date', '-id')[:page_size]
+        return {
+            'ingredients': IngredientSerializer(
+                Ingredient.objects.all(), many=True).data,
+            'recipes': ReceipeSerializer(
+                recipes, many=True, context={'request': request}).data,
+        }
+
+    def run_payload(self, name, data, iterations):
+        body = JSONRenderer().render(data)
+        if FastJSONRenderer().render(data) != body:
+            raise CommandError(f'{name}: rendered JSON differs')
+        if (FastJSONParser().parse(io.BytesIO(body))
+                != JSONParser().parse(io.BytesIO(body))):
+            raise CommandError(f'{name}: parsed data differs')
+        render = [
+            self.measure(lambda: renderer.render(data), iterations)
+            for renderer in (JSONRenderer(), FastJSONRenderer())
+        ]
+        parse = [
+            self.measure(
+                lambda: parser.parse(io.BytesIO(body)), iterations)
+            for parser in (JSONParser(), FastJSONParser())
+        ]
+        self.stdout.write(
+            f'{name:<14}{len(body) / 1024:>10.0f}'
+            f'{render[0]:>10.2f} ->{render[1]:>7.2f}'
+            f'{parse[0]:>10.2f} ->{parse[1]:>7.2f}')
+
+    @staticmethod
+    def measure(handler, iterations):
+        """Медиана времени одного вызова, мс."""
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            handler()
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        return samples[len(samples) // 2]
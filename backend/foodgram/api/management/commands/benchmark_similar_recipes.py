@@ -0,0 +1,92 @@
+import random
+import time
+from collections import defaultdict
+
+from api.management.commands._endpoints import add_database_arguments, database
+from api.models import IngredientAmount, Recipe
+from api.similar_recipes import IngredientMatrix, SimilarRecipes
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Замеряет поиск похожих рецептов: построение матрицы, запросы и
+    обновление после изменения рецептов. Результаты для --check
+    случайных рецептов сверяются с полным перебором."""
+    LIMIT = 10
+
+    help = 'Замеряет /api/recipes/{id}/similar/ на большом каталоге.'
+
+    def add_arguments(self, parser):
+        add_database_arguments(parser)
+        parser.set_defaults(recipes=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--check', type=int, default=20)
+        parser.add_argument(
+            '--changes',
+            type=int,
+            default=100,
+            help='Сколько рецептов изменить перед замером обновления')
+
+    def handle(self, *args, **options):
+        with database(options, self.stdout):
+            self.stdout.write(f'Matrix: {IngredientMatrix.__name__}')
+            index = SimilarRecipes()
+            start = time.perf_counter()
+            index.get_state()
+            self.stdout.write(
+                f'build: {(time.perf_counter() - start) * 1000:.0f} ms')
+            recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+            rand = random.Random(0)
+            self.check_results(index, rand.sample(
+                recipe_ids, min(options['check'], len(recipe_ids))))
+            samples = []
+            for recipe_id in rand.choices(recipe_ids, k=options['queries']):
+                start = time.perf_counter()
+                index.similar(recipe_id, self.LIMIT)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            self.stdout.write(
+                f'query: p50 {samples[len(samples) // 2]:.2f} ms, '
+                f'p95 {samples[int(len(samples) * 0.95)]:.2f} ms')
+            self.measure_refresh(
+                index, rand.sample(recipe_ids, options['changes']))
+
+    def check_results(self, index, recipe_ids):
+        rows = defaultdict(set)
+        for recipe_id, pk in IngredientAmount.objects.values_list(
+                'recipe_id', 'ingredient_id').iterator():
+            rows[recipe_id].add(pk)
+        for recipe_id in recipe_ids:
+            ingredients = rows[recipe_id]
+            expected = []
+            for other_id, other in rows.items():
+                overlap = len(ingredients & other)
+                if overlap and other_id != recipe_id:
+                    expected.append((other_id, overlap / (
+                        len(ingredients) + len(other) - overlap)))
+            expected.sort(key=lambda item: (-item[1], -item[0]))
+            if index.similar(recipe_id, self.LIMIT) != expected[:self.LIMIT]:
+                raise CommandError(f'Wrong result for recipe {recipe_id}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(recipe_ids)} results match brute force'))
+
+    def measure_refresh(self, index, recipe_ids):
+        """Переносит по одному ингредиенту между рецептами и замеряет
+        первый запрос после изменения."""
+        amounts = list(IngredientAmount.objects.filter(
+            recipe_id__in=recipe_ids).order_by('recipe_id', 'id'))
+        first = {}
+        for amount in amounts:
+            first.setdefault(amount.recipe_id, amount)
+        first = list(first.values())
+        IngredientAmount.objects.filter(
+            id__in=[amount.id for amount in first]).delete()
+        Recipe.objects.filter(pk__in=recipe_ids).touch()
+        # Изменения видны после очередной проверки, не раньше интервала.
+        time.sleep(index.REFRESH_INTERVAL.total_seconds())
+        start = time.perf_counter()
+        index.similar(recipe_ids[0], self.LIMIT)
+        self.stdout.write(
+            f'refresh after {len(first)} changed recipes: '
+            f'{(time.perf_counter() - start) * 1000:.1f} ms')
+        self.check_results(index, recipe_ids[:5])
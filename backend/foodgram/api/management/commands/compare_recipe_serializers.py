@@ -0,0 +1,93 @@
+import time
+
+from api.management.commands._endpoints import add_database_arguments, database
+from api.models import Recipe
+from api.serializers import ReceipeSerializer
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APIRequestFactory
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    """Сравнивает RecipeListSerializer с ReceipeSerializer.
+
+    Для анонима и пользователя с подписками сериализует одни и те же
+    страницы обоими путями: JSON должен совпадать побайтно. Затем
+    выводит медиану процессорного времени на страницу (загрузка из БД
+    и сериализация) для каждого пути.
+    """
+    ORDERING = ('-pub_date', '-id')
+
+    help = 'Проверяет и замеряет быстрый путь сериализации рецептов.'
+
+    def add_arguments(self, parser):
+        add_database_arguments(parser)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--pages', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with database(options, self.stdout):
+            follow = Follow.objects.select_related('follower').first()
+            if follow is None:
+                raise CommandError('Not enough data, run generate_data first')
+            for user in (AnonymousUser(), follow.follower):
+                self.run_user(user, options)
+
+    def run_user(self, user, options):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        context = {'request': request}
+        size = options['page_size']
+        pages = [(number * size, (number + 1) * size)
+                 for number in range(options['pages'])]
+
+        def reference(start, stop):
+            recipes = Recipe.objects.for_serialization(user).order_by(
+                *Command.ORDERING)[start:stop]
+            return ListSerializer(
+                recipes, child=ReceipeSerializer(), context=context).data
+
+        def fast(start, stop):
+            recipes = Recipe.objects.with_user_flags(user).order_by(
+                *Command.ORDERING)[start:stop]
+            return ReceipeSerializer(
+                recipes, many=True, context=context).data
+
+        renderer = JSONRenderer()
+        for start, stop in pages:
+            expected = renderer.render(reference(start, stop))
+            actual = renderer.render(fast(start, stop))
+            if expected != actual:
+                raise CommandError(
+                    f'{user}: output differs on recipes {start}-{stop}:\n'
+                    f'{expected[:500]}\n{actual[:500]}')
+        label = user if user.is_authenticated else 'anonymous'
+        times = {
+            name: self.measure(handler, pages, options['iterations'])
+            for name, handler in (('ReceipeSerializer', reference),
+                                  ('RecipeListSerializer', fast))
+        }
+        speedup = times['ReceipeSerializer'] / times['RecipeListSerializer']
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: {len(pages)} pages of {size} are identical'))
+        for name, value in times.items():
+            self.stdout.write(f'    {name:<24}{value:>8.2f} ms/page')
+        self.stdout.write(f'    speedup {speedup:.1f}x')
+
+    @staticmethod
+    def measure(handler, pages, iterations):
+        """Медиана процессорного времени на страницу, мс."""
+        samples = []
+        for _ in range(iterations):
+            start = time.process_time()
+            for page in pages:
+                handler(*page)
+            samples.append(
+                (time.process_time() - start) * 1000 / len(pages))
+        samples.sort()
+        return samples[len(samples) // 2]
@@ -0,0 +1,103 @@
+import re
+
+from api.management.commands._endpoints import (add_database_arguments,
+                                                database, get_cases,
+                                                get_client, request)
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class Command(BaseCommand):
+    """Выполняет EXPLAIN для SQL, который отправляют основные эндпоинты,
+    и отмечает полные просмотры таблиц, в которых не меньше --min-rows
+    строк. Завершается ошибкой, если такие просмотры найдены."""
+    EXPLAIN = {
+        'postgresql': 'EXPLAIN',
+        'sqlite': 'EXPLAIN QUERY PLAN',
+    }
+    FULL_SCAN = {
+        'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)'),
+        'sqlite': re.compile(
+            r'\bSCAN (?:TABLE )?(?P<table>\w+)(?!.*\bUSING\b)'),
+    }
+    # Псевдонимы таблиц в подзапросах Django: "api_favorite" U0.
+    ALIAS = re.compile(r'"(?P<table>\w+)" (?P<alias>U\d+)\b')
+
+    help = 'Ищет полные просмотры больших таблиц в планах запросов API.'
+
+    def add_arguments(self, parser):
+        add_database_arguments(parser)
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=1000,
+            help='Таблицы меньшего размера не проверяются')
+        parser.add_argument(
+            '--ignore-table',
+            action='append',
+            default=[],
+            help='Не считать ошибкой полный просмотр этой таблицы')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in Command.EXPLAIN:
+            raise CommandError(f'{connection.vendor} is not supported')
+        with database(options, self.stdout):
+            found = self.run_cases(options)
+        if found:
+            raise CommandError(f'{found} full scans of large tables found.')
+        self.stdout.write(self.style.SUCCESS('No full scans found.'))
+
+    def run_cases(self, options):
+        self.table_names = set(connection.introspection.table_names())
+        self.table_sizes = {}
+        found = 0
+        for name, user, url in get_cases():
+            client = get_client(user)
+            # Первый запрос прогревает кеши, план берётся со второго.
+            request(client, url)
+            with CaptureQueriesContext(connection) as context:
+                request(client, url)
+            scans = [
+                (table, rows, query['sql'])
+                for query in context.captured_queries
+                if query['sql'].lstrip().upper().startswith('SELECT')
+                for table, rows in self.find_full_scans(query['sql'])
+                if rows >= options['min_rows']
+                and table not in options['ignore_table']
+            ]
+            if not scans:
+                self.stdout.write(f'{name}: ok')
+            for table, rows, sql in scans:
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: full scan of {table} ({rows} rows)'))
+                self.stdout.write(f'    {sql[:300]}')
+            found += len(scans)
+        return found
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{Command.EXPLAIN[connection.vendor]} {sql}')
+            return [str(row[-1]) for row in cursor.fetchall()]
+
+    def find_full_scans(self, sql):
+        aliases = {
+            match['alias']: match['table']
+            for match in Command.ALIAS.finditer(sql)
+        }
+        pattern = Command.FULL_SCAN[connection.vendor]
+        for line in self.explain(sql):
+            match = pattern.search(line)
+            if match is None:
+                continue
+            table = aliases.get(match['table'], match['table'])
+            if table in self.table_names:
+                yield table, self.count_rows(table)
+
+    def count_rows(self, table):
+        if table not in self.table_sizes:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                self.table_sizes[table] = cursor.fetchone()[0]
+        return self.table_sizes[table]
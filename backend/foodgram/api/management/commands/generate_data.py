@@ -0,0 +1,142 @@
+import random
+
+from api import shopping_list
+from api.models import (Cart, Favorite, Ingredient, IngredientAmount, Recipe,
+                        Tag)
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from users.models import Follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    TAGS = (
+        ('Завтрак', '#E26C2D'),
+        ('Обед', '#49B64E'),
+        ('Ужин', '#8775D2'),
+        ('Десерт', '#F2C94C'),
+        ('Выпечка', '#C0392B'),
+    )
+    PASSWORD = 'benchmark'
+    IMAGE = 'recipes/benchmark.png'
+    BATCH_SIZE = 1000
+
+    help = ('Создаёт синтетические данные: пользователей, рецепты, '
+            'подписки, избранное и списки покупок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='Подписок на пользователя')
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Рецептов в избранном у пользователя')
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Рецептов в списке покупок у пользователя')
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rand = random.Random(options['seed'])
+        if not Ingredient.objects.exists():
+            call_command(
+                'read_data_from_json', file='ingredients.csv',
+                stdout=self.stdout)
+        with transaction.atomic():
+            tags = self.create_tags()
+            users = self.create_users(options['users'])
+            recipes = self.create_recipes(
+                rand, users, tags, options['recipes'],
+                options['ingredients_per_recipe'])
+            self.create_pairs(
+                rand, Follow, 'follower', 'author', users, users,
+                options['follows'])
+            self.create_pairs(
+                rand, Favorite, 'user', 'recipe', users, recipes,
+                options['favorites'])
+            self.create_pairs(
+                rand, Cart, 'user', 'recipe', users, recipes,
+                options['carts'])
+            Recipe.objects.rebuild_counters()
+            shopping_list.refresh(user.pk for user in users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users and {len(recipes)} recipes.'))
+
+    def create_tags(self):
+        for name, color in Command.TAGS:
+            Tag.objects.get_or_create(name=name, defaults={'color': color})
+        return list(Tag.objects.all())
+
+    @staticmethod
+    def last_id(model):
+        return model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+    def create_users(self, count):
+        last_id = Command.last_id(User)
+        password = make_password(Command.PASSWORD)
+        User.objects.bulk_create(
+            (User(
+                username=f'bench{last_id + number}',
+                email=f'bench{last_id + number}@example.com',
+                first_name='Bench',
+                last_name=str(number),
+                password=password,
+            ) for number in range(count)),
+            batch_size=Command.BATCH_SIZE)
+        return list(User.objects.filter(id__gt=last_id))
+
+    def create_recipes(self, rand, users, tags, count, per_recipe):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        last_id = Command.last_id(Recipe)
+        Recipe.objects.bulk_create(
+            (Recipe(
+                author=rand.choice(users),
+                name=f'Рецепт {number}',
+                image=Command.IMAGE,
+                text='Синтетический рецепт для замеров производительности.',
+                cooking_time=rand.randint(5, 180),
+            ) for number in range(count)),
+            batch_size=Command.BATCH_SIZE)
+        recipes = list(Recipe.objects.filter(id__gt=last_id).only('id'))
+        recipe_tags = Recipe.tags.through
+        recipe_tags.objects.bulk_create(
+            (recipe_tags(recipe_id=recipe.id, tag_id=tag.id)
+             for recipe in recipes
+             for tag in rand.sample(tags, rand.randint(1, 2))),
+            batch_size=Command.BATCH_SIZE)
+        per_recipe = min(per_recipe, len(ingredient_ids))
+        IngredientAmount.objects.bulk_create(
+            (IngredientAmount(
+                recipe_id=recipe.id,
+                ingredient_id=ingredient_id,
+                amount=rand.randint(1, 500),
+            )
+                for recipe in recipes
+                for ingredient_id in rand.sample(ingredient_ids, per_recipe)),
+            batch_size=Command.BATCH_SIZE)
+        return recipes
+
+    def create_pairs(self, rand, model, owner_field, target_field,
+                     owners, targets, per_owner):
+        """Создаёт per_owner уникальных связей для каждого владельца."""
+        objects = []
+        for owner in owners:
+            picked = rand.sample(targets, min(per_owner + 1, len(targets)))
+            if model is Follow:
+                picked = [target for target in picked if target != owner]
+            for target in picked[:per_owner]:
+                objects.append(model(**{
+                    f'{owner_field}_id': owner.pk,
+                    f'{target_field}_id': target.pk,
+                }))
+        model.objects.bulk_create(
+            objects, batch_size=Command.BATCH_SIZE, ignore_conflicts=True)
@@ -1,79 +1,134 @@
 
+import csv
 import json
-import os
 import pathlib
+import time
 
+from api.ingredient_index import IngredientIndex
 from api.models import Ingredient
 from chardet import detect
 from django.conf import settings
-from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand, CommandError
-
-User = get_user_model()
+from django.db import transaction
 
 
 class Command(BaseCommand):
-    FILES_AND_MODELS_NAME = {
-        'ingredients.json': {'model_obj': Ingredient}
-    }
+    DEFAULT_FILE = 'ingredients.json'
+    READERS = {'.json': 'read_json', '.csv': 'read_csv'}
+    CHUNK_SIZE = 64 * 1024
 
-    help = "This script update rating in DB models Title."
+    help = 'Загружает ингредиенты из JSON или CSV файла.'
 
-    def check_that_all_files_exists(self) -> None:
-        """Проверяет наличие необходимых файлов в директории."""
-        for file in Command.FILES_AND_MODELS_NAME:
-            if not os.path.exists(file):
-                raise CommandError(f'"{file}" not exist in dir {os.getcwd()} ')
-            self.stdout.write(self.style.SUCCESS(f'File {file} is exists.'))
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path_to_dir',
+            type=str,
+            help='Abs path to dir with files',
+            nargs='?')
+        parser.add_argument(
+            '--file',
+            default=Command.DEFAULT_FILE,
+            help='ingredients.json или ingredients.csv')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном INSERT')
 
     @staticmethod
-    def go_to_dir_with_data_files(path: str) -> None:
-        """Переходит в директорию где должны хранится файлы для заполнения из БД.
-        По умолчанию: ~/static/data"""
+    def get_file_path(path: str, file_name: str) -> pathlib.Path:
+        """Возвращает путь к файлу с данными.
+        По умолчанию файл ищется в директории data в корне проекта."""
         if path is None:
-            os.chdir(settings.BASE_DIR)
-            os.chdir("...")
-            os.chdir(pathlib.Path.cwd() / 'data')
-        elif os.path.exists(path):
-            os.chdir(path)
+            data_dir = pathlib.Path(settings.BASE_DIR).parent.parent / 'data'
         else:
-            raise CommandError(f"Path {path} is not exist")
+            data_dir = pathlib.Path(path)
+        if not data_dir.exists():
+            raise CommandError(f'Path {data_dir} is not exist')
+        file_path = data_dir / file_name
+        if not file_path.exists():
+            raise CommandError(f'"{file_name}" not exist in dir {data_dir}')
+        if file_path.suffix not in Command.READERS:
+            raise CommandError(f'Unsupported file format {file_path.suffix}')
+        return file_path
 
     @staticmethod
-    def detect_encoding(file) -> dict:
-        with open(file, "rb") as f:
-            return detect(f.read())
+    def detect_encoding(file_path) -> str:
+        """Определяет кодировку по первому блоку файла."""
+        with open(file_path, 'rb') as f:
+            return detect(f.read(Command.CHUNK_SIZE))['encoding'] or 'utf-8'
 
     @staticmethod
-    def get_file_reader(file: str):
-        encoding_info = Command.detect_encoding(file)
-        with open(file, "r", encoding=encoding_info["encoding"]) as f:
-            reader = json.load(f)
-            if len(reader) == 0:
-                raise CommandError("File is empty")
-            return reader
+    def read_json(file):
+        """Читает JSON-массив объектов по частям, не загружая его целиком."""
+        decoder = json.JSONDecoder()
+        buffer = file.read(Command.CHUNK_SIZE).lstrip('\ufeff').lstrip()
+        if not buffer.startswith('['):
+            raise CommandError('File must contain a JSON array')
+        buffer = buffer[1:]
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if buffer.startswith(']'):
+                return
+            try:
+                row, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = file.read(Command.CHUNK_SIZE)
+                if not chunk:
+                    raise CommandError('Unexpected end of JSON file')
+                buffer += chunk
+                continue
+            yield row
+            buffer = buffer[end:]
 
     @staticmethod
-    def load_data_from_csv():
-        for file_name, data in Command.FILES_AND_MODELS_NAME.items():
-            reader = Command.get_file_reader(file_name)
-            model_object = data['model_obj']
-            for row in reader:
-                model_object.objects.create(**row)
+    def read_csv(file):
+        for row in csv.reader(file):
+            if row:
+                yield {'name': row[0], 'measurement_unit': row[1]}
 
-    def add_arguments(self, parser):
-        parser.add_argument(
-            'path_to_dir',
-            type=str,
-            help='Abs path to dir with files',
-            nargs="?")
+    def import_rows(self, rows, batch_size):
+        """Сохраняет новые ингредиенты пачками, существующие пропускает."""
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit'))
+        created = skipped = 0
+        started = time.monotonic()
+        batch = []
+        for row in rows:
+            key = (row['name'].strip(), row['measurement_unit'].strip())
+            if key in existing:
+                skipped += 1
+                continue
+            existing.add(key)
+            batch.append(Ingredient(name=key[0], measurement_unit=key[1]))
+            if len(batch) >= batch_size:
+                Ingredient.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+                self.report(created, skipped, started)
+        Ingredient.objects.bulk_create(batch)
+        created += len(batch)
+        self.report(created, skipped, started)
+        return created
+
+    def report(self, created, skipped, started):
+        elapsed = time.monotonic() - started or 1e-9
+        self.stdout.write(
+            f'Created: {created}, skipped: {skipped}, '
+            f'{(created + skipped) / elapsed:.0f} rows/s')
 
     def handle(self, *args, **options):
-        path = options['path_to_dir']
-        Command.go_to_dir_with_data_files(path=path)
-        self.check_that_all_files_exists()
+        file_path = Command.get_file_path(
+            options['path_to_dir'], options['file'])
+        reader = getattr(Command, Command.READERS[file_path.suffix])
+        encoding = Command.detect_encoding(file_path)
         try:
-            Command.load_data_from_csv()
-        except Exception as error:
-            raise CommandError("Objects can create", error)
-        self.stdout.write(self.style.SUCCESS('Date Base Update.'))
+            with open(file_path, encoding=encoding) as f:
+                with transaction.atomic():
+                    created = self.import_rows(
+                        reader(f), options['batch_size'])
+                    IngredientIndex.invalidate()
+        except (KeyError, IndexError, ValueError) as error:
+            raise CommandError(f'Objects can not be created: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Date Base Update. {created} ingredients added.'))
@@ -0,0 +1,26 @@
+from api.models import Recipe
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает favorites_count и carts_count у рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов в одном UPDATE')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        updated = 0
+        for start in range(0, last_id + 1, chunk_size):
+            updated += Recipe.objects.filter(
+                id__gte=start, id__lt=start + chunk_size
+            ).rebuild_counters()
+            self.stdout.write(f'{updated} recipes updated')
+        self.stdout.write(self.style.SUCCESS(
+            f'Counters rebuilt for {updated} recipes.'))
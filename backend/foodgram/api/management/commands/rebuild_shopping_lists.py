@@ -0,0 +1,29 @@
+from api import shopping_list
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает списки покупок пользователей по корзинам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Количество пользователей в одной транзакции')
+
+    def handle(self, *args, **options):
+        user_ids = list(
+            User.objects.order_by('pk').values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        for start in range(0, len(user_ids), chunk_size):
+            with transaction.atomic():
+                shopping_list.refresh(user_ids[start:start + chunk_size])
+            self.stdout.write(
+                f'{min(start + chunk_size, len(user_ids))} users done')
+        self.stdout.write(self.style.SUCCESS(
+            f'Shopping lists rebuilt for {len(user_ids)} users.'))
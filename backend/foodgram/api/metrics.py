@@ -0,0 +1,219 @@
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection
+from rest_framework.serializers import BaseSerializer
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_current_request = contextvars.ContextVar('metrics_request', default=None)
+_local = threading.local()
+_registries = []
+
+
+class EndpointStats:
+    __slots__ = ('requests', 'latency_sum', 'buckets', 'queries',
+                 'sql_time', 'serializer_time', 'response_bytes')
+
+    def __init__(self):
+        self.requests = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.response_bytes = 0
+
+
+class RequestStats:
+    __slots__ = ('queries', 'sql_time', 'serializer_time',
+                 'serializer_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+
+def get_registry():
+    """Статистика текущего потока.
+
+    Каждый поток пишет только в свой словарь, поэтому блокировки при
+    записи не нужны; при выгрузке словари всех потоков суммируются.
+    """
+    registry = getattr(_local, 'registry', None)
+    if registry is None:
+        registry = defaultdict(EndpointStats)
+        _local.registry = registry
+        _registries.append(registry)
+    return registry
+
+
+def record(endpoint, latency, request_stats, response_bytes):
+    stats = get_registry()[endpoint]
+    stats.requests += 1
+    stats.latency_sum += latency
+    for position, bound in enumerate(LATENCY_BUCKETS):
+        if latency <= bound:
+            stats.buckets[position] += 1
+            break
+    stats.queries += request_stats.queries
+    stats.sql_time += request_stats.sql_time
+    stats.serializer_time += request_stats.serializer_time
+    stats.response_bytes += response_bytes
+
+
+def collect():
+    totals = defaultdict(EndpointStats)
+    for registry in list(_registries):
+        for endpoint, stats in list(registry.items()):
+            total = totals[endpoint]
+            total.requests += stats.requests
+            total.latency_sum += stats.latency_sum
+            total.buckets = [
+                a + b for a, b in zip(total.buckets, stats.buckets)]
+            total.queries += stats.queries
+            total.sql_time += stats.sql_time
+            total.serializer_time += stats.serializer_time
+            total.response_bytes += stats.response_bytes
+    return totals
+
+
+def render_prometheus():
+    worker = os.getpid()
+    lines = [
+        '# HELP foodgram_request_duration_seconds Request latency.',
+        '# TYPE foodgram_request_duration_seconds histogram',
+    ]
+    totals = sorted(collect().items())
+    for (endpoint, method), stats in totals:
+        labels = f'endpoint="{endpoint}",method="{method}",worker="{worker}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+            cumulative += count
+            lines.append(
+                'foodgram_request_duration_seconds_bucket'
+                f'{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(
+            'foodgram_request_duration_seconds_bucket'
+            f'{{{labels},le="+Inf"}} {stats.requests}')
+        lines.append(
+            f'foodgram_request_duration_seconds_sum{{{labels}}} '
+            f'{stats.latency_sum}')
+        lines.append(
+            f'foodgram_request_duration_seconds_count{{{labels}}} '
+            f'{stats.requests}')
+    counters = (
+        ('foodgram_sql_queries_total', 'SQL queries.', 'queries'),
+        ('foodgram_sql_duration_seconds_total', 'Time spent in SQL.',
+         'sql_time'),
+        ('foodgram_serializer_duration_seconds_total',
+         'Time spent in serializers.', 'serializer_time'),
+        ('foodgram_response_size_bytes_total', 'Response body size.',
+         'response_bytes'),
+    )
+    for name, description, attribute in counters:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for (endpoint, method), stats in totals:
+            lines.append(
+                f'{name}{{endpoint="{endpoint}",method="{method}",'
+                f'worker="{worker}"}} {getattr(stats, attribute)}')
+    return '\n'.join(lines) + '\n'
+
+
+def instrument_serializers():
+    """Оборачивает BaseSerializer.data, чтобы считать время сериализации.
+    Вложенные вызовы .data учитываются один раз."""
+    original = BaseSerializer.data
+    if getattr(original.fget, 'instrumented', False):
+        return
+
+    def data(self):
+        stats = _current_request.get()
+        if stats is None:
+            return original.fget(self)
+        stats.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            stats.serializer_depth -= 1
+            if stats.serializer_depth == 0:
+                stats.serializer_time += time.perf_counter() - start
+
+    data.instrumented = True
+    BaseSerializer.data = property(data)
+
+
+@contextmanager
+def track(request_stats):
+    """Считает SQL-запросы и сериализацию внутри блока в request_stats."""
+    token = _current_request.set(request_stats)
+    try:
+        with connection.execute_wrapper(request_stats.execute):
+            yield
+    finally:
+        _current_request.reset(token)
+
+
+class MetricsMiddleware:
+    """Собирает по каждому view и action число и время SQL-запросов,
+    время сериализации, гистограмму задержки и размер ответа.
+
+    Потоковый ответ формируется уже после выхода из view, поэтому его
+    части читаются под тем же учётом, а замер записывается, когда
+    отдача закончена: задержка включает всю отдачу, размер — сумму
+    отданных частей.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_serializers()
+
+    def __call__(self, request):
+        request_stats = RequestStats()
+        start = time.perf_counter()
+        with track(request_stats):
+            response = self.get_response(request)
+        match = request.resolver_match
+        endpoint = (match.url_name or match.view_name) if match else None
+        endpoint = (endpoint or 'unresolved', request.method)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, endpoint, start, request_stats)
+        else:
+            record(endpoint, time.perf_counter() - start, request_stats,
+                   len(response.content))
+        return response
+
+    @staticmethod
+    def stream(content, endpoint, start, request_stats):
+        response_bytes = 0
+        chunks = iter(content)
+        try:
+            while True:
+                with track(request_stats):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                response_bytes += len(chunk)
+                yield chunk
+        finally:
+            record(endpoint, time.perf_counter() - start, request_stats,
+                   response_bytes)
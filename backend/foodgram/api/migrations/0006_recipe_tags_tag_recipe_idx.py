@@ -0,0 +1,20 @@
+# Generated by Django 3.2.9 on 2026-10-18 18:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Составной индекс (tag_id, recipe_id) на автоматической связующей
+    таблице Recipe.tags для фильтра по тегам через EXISTS."""
+
+    dependencies = [
+        ('api', '0005_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe_idx '
+            'ON api_recipe_tags (tag_id, recipe_id);',
+            'DROP INDEX recipe_tags_tag_recipe_idx;',
+        ),
+    ]
@@ -5,6 +5,12 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import (Count, Exists, F, OuterRef, Prefetch, Subquery,
+                              Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+from users.models import Follow
 
 User = get_user_model()
 
@@ -52,6 +58,73 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Добавляет is_favorited и is_in_shopping_cart для пользователя."""
+        if user.is_anonymous:
+            return self
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(Cart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
+    def for_serialization(self, user):
+        """Загружает всё, что нужно ReceipeSerializer, фиксированным
+        числом запросов независимо от размера страницы."""
+        authors = User.objects.all()
+        if user.is_authenticated:
+            authors = authors.annotate(is_subscribed=Exists(
+                Follow.objects.filter(follower=user, author=OuterRef('pk'))))
+        return self.with_user_flags(user).prefetch_related(
+            Prefetch('author', queryset=authors),
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredientamount_set',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient'),
+            ),
+        )
+
+    def touch(self):
+        """Отмечает рецепты изменёнными: меняет updated_at, по которому
+        строятся ETag и Last-Modified."""
+        return self.update(updated_at=timezone.now())
+
+    def rebuild_counters(self):
+        """Пересчитывает favorites_count и carts_count одним UPDATE."""
+        return self.update(
+            updated_at=timezone.now(),
+            favorites_count=Coalesce(Subquery(
+                Favorite.objects.filter(recipe=OuterRef('pk')).order_by()
+                .values('recipe').annotate(count=Count('id'))
+                .values('count')
+            ), 0),
+            carts_count=Coalesce(Subquery(
+                Cart.objects.filter(recipe=OuterRef('pk')).order_by()
+                .values('recipe').annotate(count=Count('id'))
+                .values('count')
+            ), 0),
+        )
+
+    def latest_per_author(self, limit):
+        """Оставляет не больше limit последних рецептов каждого автора
+        одним запросом с ROW_NUMBER() OVER (PARTITION BY author)."""
+        ranked = self.annotate(author_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('author')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        )).values('pk', 'author_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.model.objects.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            'WHERE ranked.author_rank <= %s',
+            (*params, limit),
+        ))
+
+
 class Recipe(models.Model):
     tags = models.ManyToManyField(
         Tag,
@@ -89,11 +162,40 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Publication date',
     )
+    # Меняется при любом изменении ответа API для рецепта: полей,
+    # тегов, ингредиентов, счётчиков, а также имён тегов, ингредиентов
+    # и данных автора (см. api/signals.py).
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Last modified',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Added to favorite, times',
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Added to cart, times',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['-favorites_count', '-pub_date'],
+                         name='recipe_favorites_count_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=['updated_at'],
+                         name='recipe_updated_at_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -176,3 +278,33 @@ class Cart(models.Model):
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='unique_cart_user_recipes')
         ]
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в списке покупок пользователя.
+
+    Обновляется в той же транзакции, что и Cart или IngredientAmount
+    (см. api/shopping_list.py).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='User',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ingredient',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Total quantity',
+    )
+
+    class Meta:
+        verbose_name = 'Shopping list item'
+        verbose_name_plural = 'Shopping list items'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'ingredient'],
+                                    name='unique_shopping_list_ingredient')
+        ]
@@ -1,6 +1,123 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class Paginator(PageNumberPagination):
     page_size = 4
     page_size_query_param = 'limit'
+
+
+class RecipePaginator(Paginator):
+    """Постраничная навигация по номеру страницы или по курсору.
+
+    Если в запросе есть параметр cursor (в том числе пустой), страница
+    выбирается по ключу из полей сортировки (например, favorites_count,
+    pub_date, id) без COUNT(*) и OFFSET. Последнее поле ключа — id,
+    поэтому ключ однозначен.
+    """
+    cursor_query_param = 'cursor'
+    ordering = ('-pub_date', '-id')
+    # Поля, по которым можно строить ключ, и разбор их значений из курсора.
+    key_types = {
+        'id': int,
+        'favorites_count': int,
+        'pub_date': datetime.fromisoformat,
+    }
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset)
+        queryset = queryset.order_by(*ordering)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param], ordering)
+        if position is not None:
+            queryset = self.filter_after(queryset, ordering, position)
+        results = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            last = results[-1]
+            self.next_position = [
+                getattr(last, field.lstrip('-')) for field in ordering]
+        return results
+
+    def get_ordering(self, queryset):
+        """Сортировка запроса (её задаёт RecipeOrderingFilter), если
+        ключ по ней можно построить, иначе ordering по умолчанию."""
+        ordering = tuple(queryset.query.order_by)
+        if not ordering or not all(
+                isinstance(field, str)
+                and field.lstrip('-') in self.key_types
+                for field in ordering):
+            return self.ordering
+        if ordering[-1].lstrip('-') == 'id':
+            return ordering
+        return (*ordering, '-id')
+
+    @staticmethod
+    def filter_after(queryset, ordering, position):
+        """Строки после position: (a < x) OR (a = x AND b < y) OR ...
+        Условие на первое поле отдельно, чтобы БД шла по индексу."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        return queryset.filter(
+            condition, **{f'{first.lstrip("-")}__{lookup}': position[0]})
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    @staticmethod
+    def encode_cursor(position):
+        value = '|'.join(
+            item.isoformat() if isinstance(item, datetime) else str(item)
+            for item in position
+        ).encode()
+        return base64.urlsafe_b64encode(value).decode()
+
+    def decode_cursor(self, value, ordering):
+        if not value:
+            return None
+        try:
+            items = base64.urlsafe_b64decode(
+                value.encode()).decode().split('|')
+            if len(items) != len(ordering):
+                raise ValueError('Cursor does not match ordering')
+            return [
+                self.key_types[field.lstrip('-')](item)
+                for field, item in zip(ordering, items)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,176 @@
+import csv
+import io
+import os
+
+from django.conf import settings
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer на orjson, если он установлен.
+
+    Даты и время, Decimal, ленивые строки и прочие типы, которых orjson
+    не знает, передаются в encoder_class DRF, поэтому вывод совпадает
+    с JSONRenderer. С отступами (браузерный API, ?indent=), при
+    ensure_ascii и при ошибке orjson работает стандартный json.
+    """
+    def can_use_orjson(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None
+            and not self.ensure_ascii
+            and self.compact
+            and self.get_indent(
+                accepted_media_type, renderer_context or {}) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.can_use_orjson(
+                accepted_media_type, renderer_context):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=(orjson.OPT_PASSTHROUGH_DATETIME
+                        | orjson.OPT_PASSTHROUGH_DATACLASS),
+            )
+        except orjson.JSONEncodeError:
+            # Например, ключи не-строки или целые больше 64 бит.
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029.
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    """Базовый класс для выгрузки списка покупок.
+
+    Строки списка приходят из БД уже просуммированными; stream() отдаёт
+    файл по частям, чтобы не собирать его целиком в памяти.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(
+                f'{key}: {value}' for key, value in data.items()
+            ).encode(self.charset or 'utf-8')
+        return b''.join(self.stream(data))
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+    def get_content_type(self):
+        if self.charset:
+            return f'{self.media_type}; charset={self.charset}'
+        return self.media_type
+
+
+class ShoppingListTxtRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        for row in rows:
+            yield (f'{row["name"]},{row["measurement_unit"]}'
+                   f'-{row["total_amount"]}\n').encode(self.charset)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingListCsvRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(
+            ('name', 'measurement_unit', 'amount')).encode(self.charset)
+        for row in rows:
+            yield writer.writerow((
+                row['name'], row['measurement_unit'], row['total_amount']
+            )).encode(self.charset)
+
+
+class ShoppingListPdfRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+    FONT_NAME = 'ShoppingListFont'
+    FONT_SIZE = 12
+    MARGIN = 50
+    LINE_HEIGHT = 18
+    CHUNK_SIZE = 64 * 1024
+
+    def get_font(self):
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if self.FONT_NAME in pdfmetrics.getRegisteredFontNames():
+            return self.FONT_NAME
+        if font_path and os.path.exists(font_path):
+            pdfmetrics.registerFont(TTFont(self.FONT_NAME, font_path))
+            return self.FONT_NAME
+        return 'Helvetica'
+
+    def stream(self, rows):
+        buffer = io.BytesIO()
+        font = self.get_font()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        lines_per_page = int(
+            (height - 2 * self.MARGIN) // self.LINE_HEIGHT) - 2
+        page = 1
+
+        def start_page():
+            pdf.setFont(font, self.FONT_SIZE + 4)
+            pdf.drawString(
+                self.MARGIN, height - self.MARGIN, 'Список покупок')
+            pdf.setFont(font, self.FONT_SIZE - 2)
+            pdf.drawRightString(
+                width - self.MARGIN, self.MARGIN / 2, str(page))
+            pdf.setFont(font, self.FONT_SIZE)
+
+        start_page()
+        line = 0
+        for row in rows:
+            if line == lines_per_page:
+                pdf.showPage()
+                page += 1
+                line = 0
+                start_page()
+            y = height - self.MARGIN - (line + 2) * self.LINE_HEIGHT
+            pdf.drawString(
+                self.MARGIN,
+                y,
+                f'• {row["name"]} ({row["measurement_unit"]}) — '
+                f'{row["total_amount"]}'
+            )
+            line += 1
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(self.CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_RENDERERS = [ShoppingListTxtRenderer, ShoppingListCsvRenderer]
+if canvas is not None:
+    SHOPPING_LIST_RENDERERS.append(ShoppingListPdfRenderer)
@@ -1,10 +1,17 @@
 from django.contrib.auth import get_user_model
-from drf_extra_fields.fields import Base64ImageField
+from django.db import models, transaction
+from django.db.models import (Exists, OuterRef, Prefetch,
+                              prefetch_related_objects)
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
+from users.models import Follow
 from users.serializers import UserSerializer
 
+from . import shopping_list
+from .fields import (HashedBase64ImageField, ImageVariantsField,
+                     represent_variants)
 from .models import Cart, Favorite, Ingredient, IngredientAmount, Recipe, Tag
+from .utils.db import delete_pairs
 
 User = get_user_model()
 
@@ -39,8 +46,132 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         ]
 
 
+class IngredientInputSerializer(serializers.Serializer):
+    """Ингредиент в запросе на создание или изменение рецепта."""
+    id = serializers.IntegerField(min_value=1)
+    amount = serializers.IntegerField()
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов только для чтения.
+
+    Даёт тот же JSON, что ReceipeSerializer для каждого рецепта, но
+    авторов, теги и ингредиенты всей страницы берёт тремя запросами
+    values() и собирает словари напрямую, без объектов полей DRF.
+    Рецептам нужен только with_user_flags(), prefetch не используется.
+    """
+    AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+    pub_date = serializers.DateTimeField()
+
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.Manager) else data)
+        if not recipes:
+            return []
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_anonymous:
+            user = None
+        recipe_ids = [recipe.id for recipe in recipes]
+        authors = self.get_authors(
+            {recipe.author_id for recipe in recipes}, user)
+        tags = self.get_tags(recipe_ids)
+        ingredients = self.get_ingredients(recipe_ids)
+        favorited = self.get_flags(recipes, user, 'is_favorited', Favorite)
+        in_cart = self.get_flags(recipes, user, 'is_in_shopping_cart', Cart)
+        storage = Recipe._meta.get_field('image').storage
+        return [
+            {
+                'id': recipe.id,
+                'image': self.get_image_url(
+                    storage, recipe.image, request),
+                'image_variants': represent_variants(
+                    recipe.image.name, request) if recipe.image else None,
+                'author': authors[recipe.author_id],
+                'tags': tags.get(recipe.id, []),
+                'ingredients': ingredients.get(recipe.id, []),
+                'is_favorited': int(recipe.id in favorited),
+                'is_in_shopping_cart': int(recipe.id in in_cart),
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'pub_date': self.pub_date.to_representation(
+                    recipe.pub_date),
+                'favorites_count': recipe.favorites_count,
+                'carts_count': recipe.carts_count,
+            }
+            for recipe in recipes
+        ]
+
+    @staticmethod
+    def get_image_url(storage, image, request):
+        if not image:
+            return None
+        url = storage.url(image.name)
+        if request is None:
+            return url
+        return request.build_absolute_uri(url)
+
+    def get_authors(self, author_ids, user):
+        authors = User.objects.filter(pk__in=author_ids)
+        if user is None:
+            return {
+                author['id']: {**author, 'is_subscribed': False}
+                for author in authors.values(*self.AUTHOR_FIELDS)
+            }
+        authors = authors.annotate(is_subscribed=Exists(
+            Follow.objects.filter(follower=user, author=OuterRef('pk'))))
+        return {
+            author['id']: author
+            for author in authors.values(
+                *self.AUTHOR_FIELDS, 'is_subscribed')
+        }
+
+    @staticmethod
+    def get_tags(recipe_ids):
+        tags = {}
+        rows = Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('recipe_id', 'tag_id').values_list(
+            'recipe_id', 'tag__id', 'tag__name', 'tag__color', 'tag__slug')
+        for recipe_id, pk, name, color, slug in rows:
+            tags.setdefault(recipe_id, []).append(
+                {'id': pk, 'name': name, 'color': color, 'slug': slug})
+        return tags
+
+    @staticmethod
+    def get_ingredients(recipe_ids):
+        ingredients = {}
+        rows = IngredientAmount.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount')
+        for recipe_id, pk, name, measurement_unit, amount in rows:
+            ingredients.setdefault(recipe_id, []).append({
+                'id': pk,
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            })
+        return ingredients
+
+    @staticmethod
+    def get_flags(recipes, user, name, model):
+        """id рецептов, для которых флаг name истинен. Если рецепты
+        загружены без with_user_flags(), флаги читаются одним запросом."""
+        if user is None:
+            return set()
+        if hasattr(recipes[0], name):
+            return {recipe.id for recipe in recipes if getattr(recipe, name)}
+        return set(model.objects.filter(
+            user=user, recipe_id__in=[recipe.id for recipe in recipes]
+        ).values_list('recipe_id', flat=True))
+
+
 class ReceipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = HashedBase64ImageField()
+    image_variants = ImageVariantsField(source='image')
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = IngredientAmountSerializer(
@@ -53,12 +184,26 @@ class ReceipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        exclude = ('updated_at',)
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        if not getattr(instance, '_prefetched_objects_cache', None):
+            prefetch_related_objects([instance], Prefetch(
+                'tags', queryset=Tag.objects.order_by('id')
+            ), Prefetch(
+                'ingredientamount_set',
+                queryset=IngredientAmount.objects.select_related(
+                    'ingredient'),
+            ))
+        return super().to_representation(instance)
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return 0
+        if hasattr(obj, 'is_favorited'):
+            return int(obj.is_favorited)
         return int(Favorite.objects.filter(
             user=request.user, recipe=obj).exists())
 
@@ -66,37 +211,97 @@ class ReceipeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return 0
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return int(obj.is_in_shopping_cart)
         return int(Cart.objects.filter(user=request.user, recipe=obj).exists())
 
+    @staticmethod
+    def parse_input(field, name, value):
+        """Проверяет сырые данные из initial_data полем DRF; ошибка
+        возвращается клиенту как 400 под ключом name."""
+        try:
+            return field.run_validation(value)
+        except serializers.ValidationError as error:
+            raise serializers.ValidationError({name: error.detail})
+
     def validate(self, data):
         ingredients = self.initial_data.get('ingredients')
         if ingredients is None:
             raise serializers.ValidationError(
                 {'ingredients': 'Ingredients это необходимое поле'}
             )
+        ingredients = self.parse_input(
+            IngredientInputSerializer(many=True), 'ingredients', ingredients)
         for ingredient in ingredients:
-            if int(ingredient.get('amount')) <= 0:
+            if ingredient['amount'] <= 0:
                 raise serializers.ValidationError(
                     {'amount': 'Количество ингредиента '
                      'должно быть положительным'})
-        ingredients = {x['id']: x for x in ingredients}.values()
+        ingredients = {x['id']: x['amount'] for x in ingredients}
+        existing = Ingredient.objects.filter(
+            id__in=ingredients).values_list('id', flat=True)
+        missing = ingredients.keys() - set(existing)
+        if missing:
+            raise serializers.ValidationError(
+                {'ingredients': 'Ингредиенты не найдены: '
+                 f'{", ".join(map(str, sorted(missing)))}'}
+            )
         tags = self.initial_data.get('tags')
         if tags is None:
             raise serializers.ValidationError(
                 {'tags': 'Tag это необходимое поле'}
             )
+        tags = set(self.parse_input(
+            serializers.ListField(
+                child=serializers.IntegerField(min_value=1)),
+            'tags', tags))
+        if Tag.objects.filter(id__in=tags).count() != len(tags):
+            raise serializers.ValidationError(
+                {'tags': 'Указан несуществующий тег'}
+            )
         data['ingredients'] = ingredients
         data['tags'] = tags
         return data
 
     def fill_receipt_ingredients(self, ingredients, recipe):
-        for ingredient in ingredients:
-            IngredientAmount.objects.create(
+        IngredientAmount.objects.bulk_create([
+            IngredientAmount(
                 recipe=recipe,
-                ingredient_id=ingredient.get('id'),
-                amount=ingredient.get('amount'),
+                ingredient_id=ingredient_id,
+                amount=amount,
             )
+            for ingredient_id, amount in ingredients.items()
+        ])
 
+    def update_receipt_ingredients(self, ingredients, recipe):
+        current = {
+            item.ingredient_id: item
+            for item in IngredientAmount.objects.filter(recipe=recipe)
+        }
+        removed = [ingredient_id for ingredient_id in current
+                   if ingredient_id not in ingredients]
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = ingredients.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        created = {ingredient_id: amount
+                   for ingredient_id, amount in ingredients.items()
+                   if ingredient_id not in current}
+        # Одним DELETE и без сигналов по каждой строке: список покупок
+        # пересчитывается ниже один раз для всех изменённых ингредиентов.
+        delete_pairs(IngredientAmount, 'recipe', recipe.id,
+                     'ingredient', removed)
+        if changed:
+            IngredientAmount.objects.bulk_update(changed, ['amount'])
+        self.fill_receipt_ingredients(created, recipe)
+        affected = set(removed) | set(created) | {
+            item.ingredient_id for item in changed}
+        if affected:
+            shopping_list.refresh_recipe(recipe.id, affected)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
@@ -105,54 +310,50 @@ class ReceipeSerializer(serializers.ModelSerializer):
         self.fill_receipt_ingredients(ingredients_data, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.add(*tags)
+        instance.tags.set(validated_data.pop('tags'))
         ingredients_data = validated_data.pop('ingredients')
-        IngredientAmount.objects.filter(recipe=instance).delete()
         instance.image = validated_data.get('image', instance.image)
         instance.name = validated_data.get('name')
         instance.text = validated_data.get('text')
         instance.cooking_time = validated_data.get('cooking_time')
-        self.fill_receipt_ingredients(ingredients_data, instance)
-        instance.save()
+        self.update_receipt_ingredients(ingredients_data, instance)
+        instance.save(update_fields=(
+            'image', 'name', 'text', 'cooking_time', 'updated_at'))
         return instance
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+class RecipeIdsSerializer(serializers.Serializer):
+    MAX_RECIPES = 100
 
-    class Meta:
-        model = Favorite
-        fields = '__all__'
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Favorite.objects.all(),
-                fields=('user', 'recipe'),
-                message='Вы уже добавили рецепт в избранное',
-            )
-        ]
-
-
-class CartSerializer(serializers.ModelSerializer):
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_RECIPES,
+    )
 
-    class Meta:
-        model = Cart
-        fields = '__all__'
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Cart.objects.all(),
-                fields=('user', 'recipe'),
-                message='Вы уже добавили рецепт в корзину',
-            )
-        ]
+    def validate_recipes(self, value):
+        ids = set(value)
+        missing = ids - set(Recipe.objects.filter(
+            id__in=ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                'Рецепты не найдены: '
+                f'{", ".join(map(str, sorted(missing)))}')
+        return sorted(ids)
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+
+class SimilarRecipeSerializer(FavoriteRecipeSerializer):
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(FavoriteRecipeSerializer.Meta):
+        fields = (*FavoriteRecipeSerializer.Meta.fields, 'similarity')
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import Cart, IngredientAmount, ShoppingListItem
+
+User = get_user_model()
+
+
+def lock_users(user_ids):
+    """Блокирует строки пользователей до конца транзакции, чтобы
+    параллельные изменения одного списка покупок шли по очереди."""
+    list(User.objects.select_for_update().filter(
+        pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+
+
+@transaction.atomic
+def add_recipes(user_id, recipe_ids, sign=1):
+    """Прибавляет (sign=1) или вычитает (sign=-1) ингредиенты рецептов
+    из списка покупок пользователя. Вызывается внутри транзакции,
+    меняющей Cart."""
+    deltas = dict(IngredientAmount.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('ingredient_id').annotate(
+        total=Sum('amount')
+    ).order_by().values_list('ingredient_id', 'total'))
+    if not deltas:
+        return
+    lock_users([user_id])
+    items = {
+        item.ingredient_id: item
+        for item in ShoppingListItem.objects.filter(
+            user_id=user_id, ingredient_id__in=deltas)
+    }
+    changed, removed, created = [], [], []
+    for ingredient_id, delta in deltas.items():
+        item = items.get(ingredient_id)
+        if item is None:
+            if sign > 0:
+                created.append(ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    amount=delta))
+            continue
+        item.amount += sign * delta
+        if item.amount > 0:
+            changed.append(item)
+        else:
+            removed.append(item.id)
+    if removed:
+        ShoppingListItem.objects.filter(id__in=removed).delete()
+    if changed:
+        ShoppingListItem.objects.bulk_update(changed, ['amount'])
+    if created:
+        ShoppingListItem.objects.bulk_create(created)
+
+
+def remove_recipes(user_id, recipe_ids):
+    add_recipes(user_id, recipe_ids, sign=-1)
+
+
+@transaction.atomic
+def refresh(user_ids, ingredient_ids=None):
+    """Пересчитывает строки списков покупок пользователей по корзине.
+    Если ingredient_ids не задан, пересчитывает списки целиком."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    lock_users(user_ids)
+    items = ShoppingListItem.objects.filter(user_id__in=user_ids)
+    # Условия на ингредиенты рецепта - в одном filter(): второй вызов
+    # добавил бы ещё один JOIN и умножил суммы. Рецепт без ингредиентов
+    # дал бы строку с ingredient_id = NULL.
+    if ingredient_ids is None:
+        lookup = {'recipe__ingredientamount__ingredient_id__isnull': False}
+    else:
+        ingredient_ids = list(ingredient_ids)
+        items = items.filter(ingredient_id__in=ingredient_ids)
+        lookup = {
+            'recipe__ingredientamount__ingredient_id__in': ingredient_ids}
+    totals = Cart.objects.filter(user_id__in=user_ids, **lookup).values(
+        'user_id',
+        ingredient_id=F('recipe__ingredientamount__ingredient_id'),
+    ).annotate(
+        total=Sum('recipe__ingredientamount__amount')
+    ).order_by()
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['user_id'],
+            ingredient_id=row['ingredient_id'],
+            amount=row['total'],
+        )
+        for row in totals
+    )
+
+
+def refresh_recipe(recipe_id, ingredient_ids):
+    """Пересчитывает ингредиенты рецепта у всех, у кого он в корзине."""
+    refresh(
+        Cart.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True),
+        ingredient_ids)
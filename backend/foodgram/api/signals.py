@@ -0,0 +1,120 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished, request_started
+from django.db import connections, transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import shopping_list, user_recipes
+from .images import schedule_variants
+from .ingredient_index import IngredientIndex
+from .models import Cart, Favorite, Ingredient, IngredientAmount, Recipe, Tag
+from .utils.cache import bump_version
+
+User = get_user_model()
+
+# Поля автора, которые есть в ответе API для рецепта.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    IngredientIndex.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tags(**kwargs):
+    transaction.on_commit(partial(bump_version, 'tags'))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_related_recipes(sender, instance, created=False, **kwargs):
+    """Имена тегов и ингредиентов входят в ответ для рецепта.
+    Удаление ингредиента обрабатывает touch_ingredient_recipe."""
+    if created:
+        return
+    field = 'tags' if sender is Tag else 'ingredients'
+    Recipe.objects.filter(**{field: instance}).touch()
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(instance, created, update_fields, **kwargs):
+    if created or (
+            update_fields is not None
+            and not AUTHOR_FIELDS.intersection(update_fields)):
+        return
+    Recipe.objects.filter(author=instance).touch()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_tagged_recipes(instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            Recipe.objects.filter(pk=instance.pk).touch()
+    elif action in ('post_add', 'post_remove'):
+        Recipe.objects.filter(pk__in=pk_set).touch()
+    elif action == 'pre_clear':
+        Recipe.objects.filter(tags=instance).touch()
+
+
+@receiver(post_save, sender=Recipe)
+def build_recipe_image_variants(instance, **kwargs):
+    if instance.image:
+        transaction.on_commit(partial(schedule_variants, instance.image.name))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Cart)
+def recipe_added(sender, instance, created, **kwargs):
+    if created:
+        user_recipes.recipes_added(
+            sender, instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Cart)
+def recipe_removed(sender, instance, **kwargs):
+    user_recipes.recipes_removed(
+        sender, instance.user_id, [instance.recipe_id])
+
+
+@receiver([post_save, post_delete], sender=IngredientAmount)
+def refresh_shopping_lists(instance, **kwargs):
+    shopping_list.refresh_recipe(
+        instance.recipe_id, [instance.ingredient_id])
+
+
+@receiver([post_save, post_delete], sender=IngredientAmount)
+def touch_ingredient_recipe(instance, **kwargs):
+    """Для правок через ORM и админку. ReceipeSerializer пишет строки
+    ингредиентов без сигналов и меняет updated_at один раз, в save()."""
+    Recipe.objects.filter(pk=instance.recipe_id).touch()
+
+
+@receiver(request_finished)
+def mark_db_connections_idle(**kwargs):
+    now = time.monotonic()
+    for conn in connections.all():
+        conn.idle_since = now
+
+
+@receiver(request_started)
+def check_idle_db_connections(**kwargs):
+    """Закрывает постоянное соединение, разорванное на стороне БД, чтобы
+    запрос не упал на первом SQL. В Django 3.2 нет CONN_HEALTH_CHECKS;
+    лишний SELECT 1 делается только после долгого простоя соединения."""
+    now = time.monotonic()
+    for conn in connections.all():
+        idle_since = getattr(conn, 'idle_since', None)
+        if (conn.connection is not None
+                and conn.settings_dict.get('CONN_HEALTH_CHECKS')
+                and idle_since is not None
+                and now - idle_since > settings.DB_CONN_HEALTH_CHECK_IDLE
+                and not conn.is_usable()):
+            conn.close()
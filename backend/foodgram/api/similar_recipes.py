@@ -0,0 +1,264 @@
+import heapq
+import threading
+from collections import Counter, defaultdict, namedtuple
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import IngredientAmount, Recipe
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SparseIngredientMatrix:
+    """Матрица рецепты × ингредиенты на numpy: строки в формате CSR
+    (indptr, indices) и столбцы в формате CSC для подсчёта пересечений.
+
+    recipes и ingredients — массивы id пар рецепт-ингредиент,
+    отсортированные по рецепту.
+    """
+
+    def __init__(self, recipes, ingredients):
+        self.recipe_ids, starts = np.unique(recipes, return_index=True)
+        self.indptr = np.append(starts, len(recipes))
+        self.indices = ingredients
+        self.sizes = np.diff(self.indptr)
+        rows = np.repeat(np.arange(len(self.recipe_ids)), self.sizes)
+        order = np.argsort(ingredients, kind='stable')
+        self.column_rows = rows[order]
+        counts = np.bincount(ingredients, minlength=1)
+        self.column_ptr = np.concatenate(([0], np.cumsum(counts)))
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        array = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+        return cls(array[:, 0], array[:, 1])
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def rows(self, recipe_ids):
+        """Номера строк рецептов, которые есть в матрице."""
+        recipe_ids = np.asarray(list(recipe_ids), dtype=np.int64)
+        rows = np.searchsorted(self.recipe_ids, recipe_ids)
+        rows = rows[rows < len(self.recipe_ids)]
+        return rows[np.isin(self.recipe_ids[rows], recipe_ids)]
+
+    def ingredients(self, recipe_id):
+        rows = self.rows([recipe_id])
+        if not len(rows):
+            return None
+        start, end = self.indptr[rows[0]], self.indptr[rows[0] + 1]
+        return frozenset(self.indices[start:end].tolist())
+
+    def top(self, ingredients, limit, skip_ids):
+        """Не меньше limit пар (id рецепта, коэффициент Жаккара) с
+        наибольшим сходством, если столько рецептов пересекается."""
+        known = [pk for pk in ingredients if pk < len(self.column_ptr) - 1]
+        if not known:
+            return []
+        hits = np.concatenate([
+            self.column_rows[self.column_ptr[pk]:self.column_ptr[pk + 1]]
+            for pk in known
+        ])
+        overlap = np.bincount(hits, minlength=len(self))
+        scores = overlap / (self.sizes + len(ingredients) - overlap)
+        scores[self.rows(skip_ids)] = 0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > limit:
+            # Все рецепты с сходством не ниже limit-го, включая равные.
+            kth = np.partition(scores[candidates], -limit)[-limit]
+            candidates = candidates[scores[candidates] >= kth]
+        return list(zip(
+            self.recipe_ids[candidates].tolist(),
+            scores[candidates].tolist()))
+
+    def merge(self, delta):
+        """Новая матрица, в которой строки рецептов из delta заменены."""
+        keep = np.ones(len(self.indices), dtype=bool)
+        rows = self.rows(delta)
+        for row in rows.tolist():
+            keep[self.indptr[row]:self.indptr[row + 1]] = False
+        recipe_column = np.repeat(self.recipe_ids, self.sizes)
+        added = np.array([
+            (recipe_id, pk)
+            for recipe_id, ingredients in delta.items()
+            for pk in ingredients
+        ], dtype=np.int64).reshape(-1, 2)
+        recipes = np.concatenate((recipe_column[keep], added[:, 0]))
+        ingredients = np.concatenate((self.indices[keep], added[:, 1]))
+        order = np.lexsort((ingredients, recipes))
+        return SparseIngredientMatrix(recipes[order], ingredients[order])
+
+
+class PythonIngredientMatrix:
+    """То же без numpy: обратный индекс ингредиент -> рецепты.
+    Работает заметно медленнее на больших каталогах."""
+
+    def __init__(self, rows):
+        self.recipes = rows
+        self.postings = defaultdict(list)
+        for recipe_id, ingredients in rows.items():
+            for pk in ingredients:
+                self.postings[pk].append(recipe_id)
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        rows = defaultdict(set)
+        for recipe_id, pk in pairs:
+            rows[recipe_id].add(pk)
+        return cls({
+            recipe_id: frozenset(ingredients)
+            for recipe_id, ingredients in rows.items()
+        })
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def ingredients(self, recipe_id):
+        return self.recipes.get(recipe_id)
+
+    def top(self, ingredients, limit, skip_ids):
+        overlaps = Counter()
+        for pk in ingredients:
+            overlaps.update(self.postings.get(pk, ()))
+        scores = (
+            (recipe_id, overlap / (
+                len(self.recipes[recipe_id]) + len(ingredients) - overlap))
+            for recipe_id, overlap in overlaps.items()
+            if recipe_id not in skip_ids
+        )
+        return heapq.nlargest(
+            limit, scores, key=lambda item: (item[1], item[0]))
+
+    def merge(self, delta):
+        rows = {**self.recipes, **delta}
+        return PythonIngredientMatrix(
+            {recipe_id: row for recipe_id, row in rows.items() if row})
+
+
+IngredientMatrix = (
+    SparseIngredientMatrix if np is not None else PythonIngredientMatrix)
+
+
+class State(namedtuple(
+        'State', 'matrix delta checked_at recent')):
+    """Снимок индекса. Не изменяется: обновление создаёт новый.
+
+    delta — наборы ингредиентов рецептов, изменённых после построения
+    matrix (пустой набор у удалённых). recent — updated_at рецептов из
+    последнего окна проверки, чтобы не перечитывать их ингредиенты.
+    """
+
+
+class SimilarRecipes:
+    """Похожие рецепты по коэффициенту Жаккара наборов ингредиентов.
+
+    Матрица рецепты × ингредиенты строится в памяти процесса при первом
+    обращении. Не чаще раза в REFRESH_INTERVAL один запрос по индексу
+    updated_at находит изменённые рецепты, их наборы кладутся в delta
+    и учитываются поверх матрицы. Когда delta разрастается, она
+    вливается в новую матрицу без обращения к БД. Удалённые рецепты
+    убирает forget(): их находит view, когда не может загрузить.
+    """
+    REFRESH_INTERVAL = timedelta(seconds=1)
+    # Окно перепроверки: транзакция, изменившая рецепт, могла закрыться
+    # позже, чем прошла предыдущая проверка.
+    LAG = timedelta(seconds=5)
+    MAX_DELTA = 1000
+    MAX_DELTA_SHARE = 0.05
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def build(self):
+        checked_at = timezone.now()
+        recent = self.get_recent(checked_at)
+        pairs = IngredientAmount.objects.order_by(
+            'recipe_id', 'ingredient_id'
+        ).values_list('recipe_id', 'ingredient_id')
+        return State(IngredientMatrix.from_pairs(pairs.iterator()), {},
+                     checked_at, recent)
+
+    def get_recent(self, checked_at):
+        """updated_at рецептов, изменённых незадолго до checked_at."""
+        return dict(Recipe.objects.order_by().filter(
+            updated_at__gte=checked_at - self.LAG
+        ).values_list('id', 'updated_at'))
+
+    def refresh(self, state):
+        checked_at = timezone.now()
+        if checked_at - state.checked_at < self.REFRESH_INTERVAL:
+            return state
+        window = self.get_recent(state.checked_at)
+        changed = [recipe_id for recipe_id, updated_at in window.items()
+                   if state.recent.get(recipe_id) != updated_at]
+        rows = defaultdict(set)
+        if changed:
+            for recipe_id, pk in IngredientAmount.objects.filter(
+                    recipe_id__in=changed).values_list(
+                        'recipe_id', 'ingredient_id'):
+                rows[recipe_id].add(pk)
+        updates = {}
+        for recipe_id in changed:
+            ingredients = frozenset(rows.get(recipe_id, ()))
+            current = state.delta.get(
+                recipe_id, state.matrix.ingredients(recipe_id))
+            if ingredients != (current or frozenset()):
+                updates[recipe_id] = ingredients
+        return self.apply(
+            state._replace(checked_at=checked_at, recent=window), updates)
+
+    def apply(self, state, updates):
+        if not updates:
+            return state
+        delta = {**state.delta, **updates}
+        limit = max(self.MAX_DELTA, len(state.matrix) * self.MAX_DELTA_SHARE)
+        if len(delta) > limit:
+            return state._replace(matrix=state.matrix.merge(delta), delta={})
+        return state._replace(delta=delta)
+
+    def get_state(self):
+        """Текущий снимок. Пока другой поток его обновляет, отдаётся
+        предыдущий, чтобы запросы не ждали друг друга."""
+        if not self._lock.acquire(blocking=self._state is None):
+            return self._state
+        try:
+            if self._state is None:
+                self._state = self.build()
+            else:
+                self._state = self.refresh(self._state)
+            return self._state
+        finally:
+            self._lock.release()
+
+    def forget(self, recipe_ids):
+        """Убирает удалённые рецепты из выдачи."""
+        with self._lock:
+            if self._state is not None:
+                self._state = self.apply(self._state, {
+                    recipe_id: frozenset() for recipe_id in recipe_ids})
+
+    def similar(self, recipe_id, limit):
+        """До limit пар (id рецепта, сходство) по убыванию сходства,
+        при равенстве — сначала новые рецепты."""
+        state = self.get_state()
+        matrix, delta = state.matrix, state.delta
+        ingredients = delta.get(recipe_id, matrix.ingredients(recipe_id))
+        if not ingredients:
+            return []
+        result = matrix.top(ingredients, limit, {recipe_id, *delta})
+        for other_id, other in delta.items():
+            overlap = len(ingredients & other)
+            if overlap and other_id != recipe_id:
+                result.append((other_id, overlap / (
+                    len(ingredients) + len(other) - overlap)))
+        result.sort(key=lambda item: (-item[1], -item[0]))
+        return result[:limit]
+
+
+similar_recipes = SimilarRecipes()
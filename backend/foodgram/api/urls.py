@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, ReceipeViewSet, TagViewSet
+from .views import IngredientViewSet, MetricsView, ReceipeViewSet, TagViewSet
 
 app_name = 'api'
 
@@ -10,5 +10,6 @@ router.register('tags', TagViewSet, basename='tags')
 router.register('recipes', ReceipeViewSet, basename='recipes')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import shopping_list
+from .models import Cart, Favorite, Recipe
+from .utils.db import delete_pairs, insert_pair
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    Cart: 'carts_count',
+}
+
+
+def change_counters(model, recipe_ids, delta):
+    field = COUNTERS[model]
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now(), **{field: Greatest(F(field) + delta, 0)})
+
+
+def recipes_added(model, user_id, recipe_ids):
+    """Обновляет счётчики и список покупок после добавления в избранное
+    или корзину."""
+    change_counters(model, recipe_ids, 1)
+    if model is Cart:
+        shopping_list.add_recipes(user_id, recipe_ids)
+
+
+def recipes_removed(model, user_id, recipe_ids):
+    change_counters(model, recipe_ids, -1)
+    if model is Cart:
+        shopping_list.remove_recipes(user_id, recipe_ids)
+
+
+@transaction.atomic
+def add_recipes(model, user, recipe_ids):
+    """Добавляет рецепты в избранное или корзину одним INSERT.
+    Возвращает id рецептов, которых там ещё не было."""
+    shopping_list.lock_users([user.id])
+    existing = set(model.objects.filter(
+        user=user, recipe_id__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+    added = [pk for pk in recipe_ids if pk not in existing]
+    if added:
+        model.objects.bulk_create(
+            [model(user=user, recipe_id=pk) for pk in added],
+            ignore_conflicts=True)
+        recipes_added(model, user.id, added)
+    return added
+
+
+@transaction.atomic
+def remove_recipes(model, user, recipe_ids):
+    """Удаляет рецепты из избранного или корзины одним DELETE.
+    Возвращает id удалённых рецептов."""
+    shopping_list.lock_users([user.id])
+    queryset = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+    removed = list(queryset.order_by('recipe_id').values_list(
+        'recipe_id', flat=True))
+    if removed:
+        # Без сигналов post_delete на каждую строку: счётчики и список
+        # покупок обновляются ниже сразу для всех рецептов.
+        delete_pairs(model, 'user', user.id, 'recipe', removed)
+        recipes_removed(model, user.id, removed)
+    return removed
+
+
+@transaction.atomic
+def add_recipe(model, user, recipe_id):
+    """Добавляет рецепт одним INSERT ... ON CONFLICT DO NOTHING.
+    Возвращает False, если рецепт уже добавлен или не существует.
+    Блокировка пользователя берётся первой, как в add_recipes и
+    remove_recipes: иначе одиночная и пакетная операции могут
+    заблокировать друг друга или дважды учесть один рецепт."""
+    shopping_list.lock_users([user.id])
+    added = insert_pair(model, 'user', user.id, 'recipe', recipe_id)
+    if added:
+        recipes_added(model, user.id, [recipe_id])
+    return added
+
+
+@transaction.atomic
+def remove_recipe(model, user, recipe_id):
+    shopping_list.lock_users([user.id])
+    removed = delete_pairs(model, 'user', user.id, 'recipe', [recipe_id]) > 0
+    if removed:
+        recipes_removed(model, user.id, [recipe_id])
+    return removed
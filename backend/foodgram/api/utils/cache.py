@@ -0,0 +1,27 @@
+import uuid
+
+from django.core.cache import cache
+
+
+def get_version_key(name):
+    return f'{name}:version'
+
+
+def get_version(name):
+    """Текущая версия набора данных; меняется при каждом изменении."""
+    key = get_version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        return cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Меняет версию набора данных.
+
+    Вызывается через transaction.on_commit: если сменить версию до
+    фиксации, параллельный запрос, ещё видящий старые строки, сохранит
+    их под новой версией, и они останутся в кеше навсегда.
+    """
+    cache.set(get_version_key(name), uuid.uuid4().hex, None)
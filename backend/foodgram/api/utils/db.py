@@ -0,0 +1,58 @@
+from django.db import connection
+
+
+def insert_pair(model, owner_field, owner_id, target_field, target_id,
+                exclude_self=False):
+    """Добавляет связь owner -> target одним запросом
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+    Строка не вставляется, если цели нет, если связь уже есть или
+    (при exclude_self) если owner_id == target_id. Возвращает True,
+    если строка добавлена.
+    """
+    opts = model._meta
+    target = opts.get_field(target_field).related_model._meta
+    quote = connection.ops.quote_name
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+        f'{quote(opts.db_table)} '
+        f'({quote(opts.get_field(owner_field).column)}, '
+        f'{quote(opts.get_field(target_field).column)}) '
+        f'SELECT %s, {quote(target.pk.column)} FROM {quote(target.db_table)} '
+        f'WHERE {quote(target.pk.column)} = %s'
+    )
+    params = [owner_id, target_id]
+    if exclude_self:
+        sql += f' AND {quote(target.pk.column)} <> %s'
+        params.append(owner_id)
+    suffix = connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+    if suffix:
+        sql += f' {suffix}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount == 1
+
+
+def delete_pairs(model, owner_field, owner_id, target_field, target_ids):
+    """Удаляет связи owner -> target для target_ids одним DELETE.
+    Возвращает число удалённых строк.
+
+    Запрос выполняется мимо ORM, и сигналы pre_delete/post_delete не
+    отправляются: так удаление нескольких строк остаётся одним
+    запросом. Всё, что обновляют эти сигналы, вызывающий код обновляет
+    сам (для избранного и корзины — user_recipes.recipes_removed).
+    """
+    if not target_ids:
+        return 0
+    opts = model._meta
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    sql = (
+        f'DELETE FROM {quote(opts.db_table)} '
+        f'WHERE {quote(opts.get_field(owner_field).column)} = %s '
+        f'AND {quote(opts.get_field(target_field).column)} '
+        f'IN ({placeholders})'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [owner_id, *target_ids])
+        return cursor.rowcount
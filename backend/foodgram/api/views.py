@@ -1,113 +1,352 @@
-from functools import reduce
+import gzip
+import hashlib
 
-from django.db.models import F
-from django.http.response import HttpResponse
+from django.core.cache import cache
+from django.db.models import Exists, F, OuterRef
+from django.http.response import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, parse_etags
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from users.models import Follow
 
-from .filters import IngredientNameFilter, RecipeFilter
-from .models import Cart, Favorite, Ingredient, IngredientAmount, Recipe, Tag
-from .paginator import Paginator
-from .permissions import OwnerOrReadOnly
-from .serializers import (CartSerializer, FavoriteRecipeSerializer,
-                          FavoriteSerializer, IngredientSerializer,
-                          ReceipeSerializer, TagSerializer)
+from . import user_recipes
+from .filters import IngredientNameFilter, RecipeFilter, RecipeOrderingFilter
+from .ingredient_index import IngredientIndex, ingredient_index
+from .metrics import render_prometheus
+from .models import Cart, Favorite, Ingredient, Recipe, ShoppingListItem, Tag
+from .paginator import RecipePaginator
+from .permissions import IsAdmin, OwnerOrReadOnly
+from .renderers import SHOPPING_LIST_RENDERERS
+from .serializers import (FavoriteRecipeSerializer, IngredientSerializer,
+                          ReceipeSerializer, RecipeIdsSerializer,
+                          SimilarRecipeSerializer, TagSerializer)
+from .similar_recipes import similar_recipes
+from .utils.cache import get_version
 
 
 class BaseViewSet(viewsets.ReadOnlyModelViewSet):
+    """Справочники: ответы кешируются целиком, сжатыми, под версией
+    данных, и отдаются с ETag; при совпадении If-None-Match — 304.
+    У сжатого и несжатого ответа разные ETag.
+    """
     pagination_class = None
     permission_classes = (AllowAny,)
+    cache_name = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if self.cache_name is None or renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        version = get_version(self.cache_name)
+        path_hash = hashlib.md5(
+            request.get_full_path().encode()).hexdigest()
+        use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+        suffix = '-gz' if use_gzip else ''
+        etag = f'"{version}-{path_hash[:16]}{suffix}"'
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = f'{self.cache_name}:response:{version}:{path_hash}'
+            content = cache.get(key)
+            if content is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                body = renderer.render(
+                    response.data, renderer.media_type,
+                    self.get_renderer_context())
+                content = (body, gzip.compress(body))
+                cache.set(key, content, None)
+            response = self.get_content_response(
+                renderer, content, use_gzip)
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    @staticmethod
+    def get_content_response(renderer, content, use_gzip):
+        body, compressed = content
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = HttpResponse(
+            compressed if use_gzip else body, content_type=content_type)
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        return response
 
 
 class TagViewSet(BaseViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_name = 'tags'
 
 
 class IngredientViewSet(BaseViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filterset_class = IngredientNameFilter
+    cache_name = IngredientIndex.CACHE_NAME
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(self.search, request)
+
+    def search(self, request):
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.search(name))
+        return Response(ingredient_index.all())
 
 
 class ReceipeViewSet(viewsets.ModelViewSet):
+    SIMILAR_LIMIT = 10
+    MAX_SIMILAR_LIMIT = 50
+
     serializer_class = ReceipeSerializer
     queryset = Recipe.objects.all()
     permission_classes = (OwnerOrReadOnly,)
-    pagination_class = Paginator
+    pagination_class = RecipePaginator
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('favorites_count', 'pub_date')
+    ordering = ('-pub_date', '-id')
+
+    def get_queryset(self):
+        user = self.request.user
+        if self.action == 'retrieve':
+            return Recipe.objects.for_serialization(user)
+        # Список собирает RecipeListSerializer, prefetch ему не нужен.
+        return Recipe.objects.with_user_flags(user)
 
     def perform_create(self, serializer):
         return serializer.save(author=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        """Отдаёт ETag, а анонимам ещё и Last-Modified. Если в запросе
+        есть If-None-Match или If-Modified-Since, сначала одним запросом
+        по первичному ключу читает updated_at и флаги пользователя и при
+        совпадении отвечает 304, не загружая рецепт.
+
+        Флаги is_favorited, is_in_shopping_cart и is_subscribed входят в
+        ETag. Для вошедших пользователей Last-Modified не отдаётся: время
+        изменения этих флагов не хранится."""
+        if request.accepted_renderer.format != 'json':
+            return super().retrieve(request, *args, **kwargs)
+        if ('HTTP_IF_NONE_MATCH' in request.META
+                or 'HTTP_IF_MODIFIED_SINCE' in request.META):
+            validators = self.get_validators(
+                self.get_recipe_state(self.get_recipe_id(kwargs['pk'])))
+            response = get_conditional_response(request, *validators)
+            if response is not None:
+                return self.set_validators(response, validators)
+        instance = self.get_object()
+        response = Response(self.get_serializer(instance).data)
+        return self.set_validators(response, self.get_validators((
+            instance.pk,
+            instance.updated_at,
+            getattr(instance, 'is_favorited', False),
+            getattr(instance, 'is_in_shopping_cart', False),
+            getattr(instance.author, 'is_subscribed', False),
+        )))
+
+    def get_recipe_state(self, recipe_id):
+        """(pk, updated_at, is_favorited, is_in_shopping_cart,
+        is_subscribed) одним запросом по первичному ключу."""
+        user = self.request.user
+        queryset = Recipe.objects.filter(pk=recipe_id)
+        if user.is_anonymous:
+            state = queryset.values_list('pk', 'updated_at').first()
+            flags = (False, False, False)
+        else:
+            state = queryset.with_user_flags(user).annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    follower=user, author=OuterRef('author')))
+            ).values_list(
+                'pk', 'updated_at', 'is_favorited', 'is_in_shopping_cart',
+                'is_subscribed'
+            ).first()
+            flags = ()
+        if state is None:
+            raise NotFound()
+        return (*state, *flags)
+
+    def get_validators(self, state):
+        """ETag и Last-Modified (секунды Unix) для состояния рецепта."""
+        pk, updated_at, *flags = state
+        if timezone.is_naive(updated_at):
+            updated_at = timezone.make_aware(updated_at, timezone.utc)
+        flags = ''.join(str(int(flag)) for flag in flags)
+        etag = f'"{pk}-{updated_at.timestamp():.6f}-{flags}"'
+        if self.request.user.is_authenticated:
+            return etag, None
+        return etag, int(updated_at.timestamp())
+
+    @staticmethod
+    def set_validators(response, validators):
+        etag, last_modified = validators
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    @staticmethod
+    def get_recipe_id(pk):
+        if not str(pk).isdigit():
+            raise NotFound()
+        return int(pk)
+
+    def add_one(self, request, pk, model, message):
+        recipe_id = self.get_recipe_id(pk)
+        if not user_recipes.add_recipe(model, request.user, recipe_id):
+            get_object_or_404(Recipe.objects.only('id'), pk=recipe_id)
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                message]})
+        recipe = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time').get(pk=recipe_id)
+        serializer = FavoriteRecipeSerializer(recipe)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def remove_one(self, request, pk, model):
+        if not user_recipes.remove_recipe(
+                model, request.user, self.get_recipe_id(pk)):
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=True, methods=['POST'],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, pk=None):
-        user = request.user
-        recipe = self.get_object()
-        data = {'user': user.id, 'recipe': recipe.id}
-        serializer = FavoriteSerializer(data=data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        serializer = FavoriteRecipeSerializer(recipe)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.add_one(
+            request, pk, Favorite, 'Вы уже добавили рецепт в избранное')
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk=None):
-        user = request.user
-        recipe = self.get_object()
-        favorite = get_object_or_404(Favorite, user=user, recipe=recipe)
-        favorite.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return self.remove_one(request, pk, Favorite)
 
     @action(detail=True, methods=['POST'],
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk=None):
-        user = request.user
-        recipe = self.get_object()
-        data = {'user': user.id, 'recipe': recipe.id}
-        serializer = CartSerializer(data=data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        serializer = FavoriteRecipeSerializer(recipe)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.add_one(
+            request, pk, Cart, 'Вы уже добавили рецепт в корзину')
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk=None):
-        user = request.user
-        recipe = self.get_object()
-        favorite = get_object_or_404(Cart, user=user, recipe=recipe)
-        favorite.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return self.remove_one(request, pk, Cart)
 
-    @action(detail=False, methods=['GET'],
+    def add_many(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        added = user_recipes.add_recipes(
+            model, request.user, serializer.validated_data['recipes'])
+        return Response({'recipes': added}, status=status.HTTP_201_CREATED)
+
+    def remove_many(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        removed = user_recipes.remove_recipes(
+            model, request.user, serializer.validated_data['recipes'])
+        return Response({'recipes': removed})
+
+    @action(detail=False, methods=['POST'], url_path='favorite',
+            url_name='favorite-many', permission_classes=[IsAuthenticated])
+    def favorite_many(self, request):
+        return self.add_many(request, Favorite)
+
+    @favorite_many.mapping.delete
+    def delete_favorite_many(self, request):
+        return self.remove_many(request, Favorite)
+
+    @action(detail=False, methods=['POST'], url_path='shopping_cart',
+            url_name='shopping-cart-many',
             permission_classes=[IsAuthenticated])
+    def shopping_cart_many(self, request):
+        return self.add_many(request, Cart)
+
+    @shopping_cart_many.mapping.delete
+    def delete_shopping_cart_many(self, request):
+        return self.remove_many(request, Cart)
+
+    @action(detail=True, methods=['GET'], permission_classes=[AllowAny])
+    def similar(self, request, pk=None):
+        """До ?limit= (по умолчанию 10) рецептов с самыми похожими
+        наборами ингредиентов."""
+        recipe_id = self.get_recipe_id(pk)
+        limit = request.query_params.get('limit', str(self.SIMILAR_LIMIT))
+        maximum = self.MAX_SIMILAR_LIMIT
+        if not limit.isdigit() or not 1 <= int(limit) <= maximum:
+            raise ValidationError(
+                {'limit': [f'Укажите число от 1 до {maximum}']})
+        ranked = similar_recipes.similar(recipe_id, int(limit))
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time'
+        ).in_bulk([recipe_id, *(other_id for other_id, _ in ranked)])
+        if recipe_id not in recipes:
+            raise NotFound()
+        deleted = [other_id for other_id, _ in ranked
+                   if other_id not in recipes]
+        if deleted:
+            similar_recipes.forget(deleted)
+        result = []
+        for other_id, similarity in ranked:
+            if other_id in recipes:
+                recipe = recipes[other_id]
+                recipe.similarity = round(similarity, 4)
+                result.append(recipe)
+        return Response(SimilarRecipeSerializer(
+            result, many=True, context={'request': request}).data)
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=[IsAuthenticated],
+            renderer_classes=SHOPPING_LIST_RENDERERS)
     def download_shopping_cart(self, request):
-        user = request.user
-        all_ingredients = IngredientAmount.objects.filter(
-            recipe__purchase__user=user).annotate(
-            ingredient_name=F('ingredient__name'),
-            ingredient_amount=F('amount'),
-            ingredient_measurement=F('ingredient__measurement_unit')
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
+        ).values(
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+            total_amount=F('amount'),
+        ).order_by('name', 'measurement_unit')
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=renderer.get_content_type(),
         )
-        list = {}
-        for ing in all_ingredients:
-            key = f'{ing.ingredient_name},{ing.ingredient_measurement}'
-            if key in list:
-                list[key] = list[key] + ing.ingredient_amount
-            else:
-                list[key] = ing.ingredient_amount
+        filename = f'shopping_list.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
 
-        cart_txt = reduce(lambda x, key: x + key + '-'
-                          + str(list[key]) + '\n', list, '')
 
-        response = HttpResponse(
-            cart_txt, content_type='text/plain; charset=utf-8')
-        filename = 'shopping_list.txt'
-        response['Content-Disposition'] = 'attachment; filename={0}'.format(
-            filename)
+class MetricsView(APIView):
+    """Метрики в формате Prometheus.
 
-        return response
+    Счётчики хранятся в памяти процесса, поэтому ответ содержит только
+    данные воркера gunicorn, который обработал запрос (метка worker).
+    При нескольких воркерах каждый опрос видит один из них.
+    """
+    permission_classes = (IsAdmin,)
+
+    def get(self, request):
+        return HttpResponse(
+            render_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8')
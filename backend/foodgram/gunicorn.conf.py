@@ -0,0 +1,25 @@
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', default='0.0.0.0:8000')
+
+# Потоки внутри воркера делят процесс, поэтому кеши в памяти (индекс
+# ингредиентов, токены, метрики) общие; у каждого потока своё постоянное
+# соединение с БД. Всего соединений: workers * threads. По умолчанию оно
+# не превышает DB_MAX_CONNECTIONS - запас до max_connections PostgreSQL
+# (100 по умолчанию) на миграции, админку и служебные подключения.
+max_connections = int(os.getenv('DB_MAX_CONNECTIONS', default=80))
+workers = int(os.getenv(
+    'GUNICORN_WORKERS',
+    default=min(multiprocessing.cpu_count() * 2 + 1, max_connections)))
+threads = int(os.getenv(
+    'GUNICORN_THREADS', default=max(1, min(4, max_connections // workers))))
+worker_class = 'gthread'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', default=30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', default=5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', default=2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
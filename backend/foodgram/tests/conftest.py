@@ -0,0 +1,119 @@
+import pytest
+from api.models import (Cart, Favorite, Ingredient, IngredientAmount, Recipe,
+                        Tag)
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.authentication import token_cache
+from users.models import Follow, User
+
+
+@pytest.fixture(autouse=True)
+def isolated(settings, tmp_path):
+    """Кеш Django и кеш токенов общие для процесса: очищаем их, чтобы
+    версии и ответы не переходили из теста в тест."""
+    settings.MEDIA_ROOT = str(tmp_path)
+    cache.clear()
+    token_cache.clear()
+    yield
+    cache.clear()
+    token_cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='password', first_name='Имя', last_name='Фамилия')
+    return make_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user('user')
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user('author')
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name=name, color=color)
+        for name, color in (('Завтрак', '#E26C2D'), ('Обед', '#49B64E'),
+                            ('Ужин', '#8775D2'))
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=name, measurement_unit=unit)
+        for name, unit in (('Мука', 'г'), ('Молоко', 'мл'), ('Яйцо', 'шт'),
+                           ('Сахар', 'г'), ('Соль', 'г'))
+    ]
+
+
+@pytest.fixture
+def make_recipe(tags, ingredients):
+    def make_recipe(author, name='Рецепт', amounts=None, recipe_tags=None):
+        """amounts — {ингредиент: количество}, по умолчанию первые три
+        ингредиента."""
+        recipe = Recipe.objects.create(
+            author=author, name=name, image='recipes/recipe.png',
+            text='Описание', cooking_time=10)
+        recipe.tags.set(tags[:2] if recipe_tags is None else recipe_tags)
+        if amounts is None:
+            amounts = {ingredient: 100 for ingredient in ingredients[:3]}
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in amounts.items())
+        return recipe
+    return make_recipe
+
+
+@pytest.fixture
+def recipes(make_recipe, author, make_user, user):
+    """Двенадцать рецептов трёх авторов; часть из них у user в избранном
+    и в корзине, на двух авторов user подписан."""
+    authors = [author, make_user('second'), make_user('third')]
+    recipes = [
+        make_recipe(authors[number % 3], name=f'Рецепт {number}')
+        for number in range(12)
+    ]
+    for recipe in recipes[::2]:
+        Favorite.objects.create(user=user, recipe=recipe)
+    for recipe in recipes[::3]:
+        Cart.objects.create(user=user, recipe=recipe)
+    for followed in authors[:2]:
+        Follow.objects.create(follower=user, author=followed)
+    return recipes
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    token = Token.objects.create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def count_queries():
+    """count_queries(client, url) -> (ответ, число SQL-запросов)."""
+    def count_queries(client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        return response, len(context.captured_queries)
+    return count_queries
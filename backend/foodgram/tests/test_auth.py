@@ -0,0 +1,48 @@
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.authentication import token_cache
+
+
+@pytest.fixture
+def login(user):
+    def login():
+        client = APIClient()
+        response = client.post('/api/auth/token/login/', {
+            'email': user.email, 'password': 'password'})
+        key = response.json()['auth_token']
+        client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        return client, key
+    return login
+
+
+def test_logout_invalidates_token(
+        login, django_capture_on_commit_callbacks):
+    client, key = login()
+    assert client.get('/api/users/me/').status_code == 200
+    # Запись, которая осталась бы в LRU другого процесса gunicorn.
+    stale = token_cache.get(key)
+    assert stale is not None
+    with django_capture_on_commit_callbacks(execute=True):
+        assert client.post('/api/auth/token/logout/').status_code == 204
+    assert not Token.objects.filter(key=key).exists()
+    token_cache.set(key, stale)
+    assert client.get('/api/users/me/').status_code == 401
+
+
+def test_cached_token_skips_database(login, tags, django_assert_num_queries):
+    client, _ = login()
+    client.get('/api/tags/')
+    # Список тегов отдаётся из кеша, токен — из LRU.
+    with django_assert_num_queries(0):
+        assert client.get('/api/tags/').status_code == 200
+
+
+def test_user_change_invalidates_token(
+        login, user, django_capture_on_commit_callbacks):
+    client, _ = login()
+    assert client.get('/api/users/me/').json()['first_name'] == 'Имя'
+    with django_capture_on_commit_callbacks(execute=True):
+        user.first_name = 'Новое'
+        user.save()
+    assert client.get('/api/users/me/').json()['first_name'] == 'Новое'
@@ -0,0 +1,23 @@
+import time
+
+from api.models import Tag
+from api.signals import check_idle_db_connections
+from django.db import connection
+
+
+def test_only_idle_connection_is_checked(db, monkeypatch, settings):
+    settings.DB_CONN_HEALTH_CHECK_IDLE = 30
+    Tag.objects.exists()
+    checked, closed = [], []
+    monkeypatch.setitem(connection.settings_dict, 'CONN_HEALTH_CHECKS', True)
+    monkeypatch.setattr(
+        connection, 'is_usable', lambda: checked.append(1) or False)
+    monkeypatch.setattr(connection, 'close', lambda: closed.append(1))
+
+    monkeypatch.setattr(connection, 'idle_since', time.monotonic(), False)
+    check_idle_db_connections()
+    assert checked == [] and closed == []
+
+    connection.idle_since = time.monotonic() - 60
+    check_idle_db_connections()
+    assert checked == [1] and closed == [1]
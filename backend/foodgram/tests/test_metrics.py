@@ -0,0 +1,18 @@
+from api.metrics import collect
+
+ENDPOINT = ('recipes-download-shopping-cart', 'GET')
+
+
+def test_streaming_response_is_measured(user_client, recipes):
+    before = collect()[ENDPOINT]
+    queries, response_bytes = before.queries, before.response_bytes
+    response = user_client.get(
+        '/api/recipes/download_shopping_cart/?format=txt')
+    body = b''.join(response.streaming_content)
+    response.close()
+    stats = collect()[ENDPOINT]
+    assert body
+    assert stats.requests == before.requests + 1
+    # Строки списка покупок читаются уже во время отдачи.
+    assert stats.queries > queries
+    assert stats.response_bytes - response_bytes == len(body)
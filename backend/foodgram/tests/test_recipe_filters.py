@@ -0,0 +1,25 @@
+from api.filters import get_tag_ids
+from api.models import Tag
+from api.utils.cache import get_version
+from django.core.cache import cache
+
+
+def test_new_tag_is_filterable(
+        anon_client, author, make_recipe, tags,
+        django_capture_on_commit_callbacks):
+    make_recipe(author, recipe_tags=tags[:1])
+    old_ids = get_tag_ids()
+    with django_capture_on_commit_callbacks(execute=True):
+        tag = Tag.objects.create(name='Десерт', color='#FF00FF')
+        recipe = make_recipe(author, recipe_tags=[tag])
+        # Так поступил бы параллельный запрос, который ещё не видит тег.
+        cache.set(f'tags:ids:{get_version("tags")}', old_ids, None)
+    response = anon_client.get(f'/api/recipes/?tags={tag.slug}')
+    assert response.status_code == 200
+    assert [item['id'] for item in response.json()['results']] == [
+        recipe.id]
+
+
+def test_unknown_tag_is_rejected(anon_client, tags):
+    response = anon_client.get('/api/recipes/?tags=unknown')
+    assert response.status_code == 400
@@ -0,0 +1,48 @@
+import pytest
+from api.models import Recipe
+from django.utils import timezone
+
+
+@pytest.fixture
+def tied_recipes(recipes):
+    """Одинаковые pub_date у всех и favorites_count у половины рецептов:
+    однозначный порядок задаёт только id."""
+    Recipe.objects.update(pub_date=timezone.now(), favorites_count=0)
+    Recipe.objects.filter(
+        pk__in=[recipe.pk for recipe in recipes[:6]]).update(
+            favorites_count=3)
+    return sorted(
+        Recipe.objects.all(),
+        key=lambda recipe: (-recipe.favorites_count, -recipe.id))
+
+
+def collect_pages(client, url):
+    ids = []
+    while url:
+        data = client.get(url).json()
+        ids.extend(item['id'] for item in data['results'])
+        url = data['next']
+    return ids
+
+
+@pytest.mark.parametrize('pagination', ['page=1', 'cursor='])
+def test_popular_ordering_pages_do_not_overlap(
+        anon_client, tied_recipes, pagination):
+    ids = collect_pages(
+        anon_client,
+        f'/api/recipes/?ordering=-favorites_count&limit=5&{pagination}')
+    assert ids == [recipe.id for recipe in tied_recipes]
+
+
+def test_default_ordering_breaks_ties_by_id(anon_client, tied_recipes):
+    ids = collect_pages(anon_client, '/api/recipes/?limit=5&cursor=')
+    assert ids == sorted(ids, reverse=True)
+    assert len(ids) == len(tied_recipes)
+
+
+def test_cursor_from_other_ordering_is_rejected(anon_client, tied_recipes):
+    data = anon_client.get('/api/recipes/?limit=5&cursor=').json()
+    cursor = data['next'].split('cursor=')[1].split('&')[0]
+    response = anon_client.get(
+        f'/api/recipes/?ordering=-favorites_count&cursor={cursor}')
+    assert response.status_code == 404
@@ -0,0 +1,63 @@
+import pytest
+
+# Бюджеты совпадают с api/management/commands/benchmark.py.
+LIST_BUDGET = 5
+DETAIL_BUDGET = 4
+
+
+@pytest.mark.parametrize('client_name', ['anon_client', 'user_client'])
+def test_recipe_list_queries_do_not_depend_on_page_size(
+        request, client_name, recipes, count_queries):
+    client = request.getfixturevalue(client_name)
+    # Первый запрос прогревает кеш токенов.
+    client.get('/api/recipes/?limit=1')
+    counts = {}
+    for limit in (2, 6, 12):
+        response, counts[limit] = count_queries(
+            client, f'/api/recipes/?limit={limit}')
+        assert response.status_code == 200
+        assert len(response.json()['results']) == limit
+    assert len(set(counts.values())) == 1, counts
+    assert counts[12] <= LIST_BUDGET
+
+
+def test_recipe_list_flags_for_user(user_client, recipes):
+    response = user_client.get('/api/recipes/?limit=12')
+    results = {item['id']: item for item in response.json()['results']}
+    for number, recipe in enumerate(recipes):
+        item = results[recipe.id]
+        assert item['is_favorited'] == int(number % 2 == 0)
+        assert item['is_in_shopping_cart'] == int(number % 3 == 0)
+        assert item['author']['is_subscribed'] == (number % 3 != 2)
+
+
+@pytest.mark.parametrize('client_name', ['anon_client', 'user_client'])
+def test_recipe_detail_queries_are_fixed(
+        request, client_name, recipes, make_recipe, author, tags,
+        ingredients, count_queries):
+    client = request.getfixturevalue(client_name)
+    small = make_recipe(
+        author, amounts={ingredients[0]: 1}, recipe_tags=tags[:1])
+    large = make_recipe(
+        author, amounts={ingredient: 1 for ingredient in ingredients},
+        recipe_tags=tags)
+    client.get(f'/api/recipes/{small.id}/')
+    counts = []
+    for recipe in (small, large, recipes[0]):
+        response, count = count_queries(client, f'/api/recipes/{recipe.id}/')
+        assert response.status_code == 200
+        counts.append(count)
+    assert len(set(counts)) == 1, counts
+    assert counts[0] <= DETAIL_BUDGET
+
+
+def test_recipe_detail_flags_for_user(user_client, anon_client, recipes):
+    recipe = recipes[0]
+    data = user_client.get(f'/api/recipes/{recipe.id}/').json()
+    assert data['is_favorited'] == 1
+    assert data['is_in_shopping_cart'] == 1
+    assert data['author']['is_subscribed'] is True
+    data = anon_client.get(f'/api/recipes/{recipe.id}/').json()
+    assert data['is_favorited'] == 0
+    assert data['is_in_shopping_cart'] == 0
+    assert data['author']['is_subscribed'] is False
@@ -0,0 +1,40 @@
+import pytest
+from api.models import Recipe
+from api.serializers import ReceipeSerializer
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APIRequestFactory
+
+ORDERING = ('-pub_date', '-id')
+
+
+@pytest.fixture
+def mixed_recipes(recipes, author, make_recipe):
+    """Кроме обычных рецептов — без ингредиентов, тегов и изображения."""
+    make_recipe(author, name='Без ингредиентов', amounts={})
+    make_recipe(author, name='Без тегов', recipe_tags=[])
+    Recipe.objects.filter(pk=make_recipe(author, name='Без фото').pk).update(
+        image='')
+    return recipes
+
+
+@pytest.mark.parametrize('user_name', ['anonymous', 'user'])
+def test_list_serializer_matches_recipe_serializer(
+        request, user_name, mixed_recipes):
+    user = (AnonymousUser() if user_name == 'anonymous'
+            else request.getfixturevalue('user'))
+    http_request = Request(APIRequestFactory().get('/api/recipes/'))
+    http_request.user = user
+    context = {'request': http_request}
+    expected = ListSerializer(
+        Recipe.objects.for_serialization(user).order_by(*ORDERING),
+        child=ReceipeSerializer(), context=context).data
+    actual = ReceipeSerializer(
+        Recipe.objects.with_user_flags(user).order_by(*ORDERING),
+        many=True, context=context).data
+    assert len(actual) == Recipe.objects.count()
+    assert [list(item) for item in actual] == [
+        list(item) for item in expected]
+    assert JSONRenderer().render(actual) == JSONRenderer().render(expected)
@@ -0,0 +1,105 @@
+import pytest
+from api.models import Cart, Ingredient, Recipe, ShoppingListItem
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoA'
+    'AAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.fixture
+def payload(tags, ingredients):
+    return {
+        'name': 'Блины',
+        'text': 'Смешать и пожарить',
+        'cooking_time': 20,
+        'image': IMAGE,
+        'tags': [tags[0].id],
+        'ingredients': [
+            {'id': ingredients[0].id, 'amount': 200},
+            {'id': ingredients[1].id, 'amount': '300'},
+        ],
+    }
+
+
+def test_create_recipe(user_client, payload, ingredients):
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 201, response.json()
+    recipe = Recipe.objects.get(pk=response.json()['id'])
+    assert dict(recipe.ingredientamount_set.values_list(
+        'ingredient_id', 'amount')) == {
+            ingredients[0].id: 200, ingredients[1].id: 300}
+
+
+@pytest.mark.parametrize('field, value', [
+    ('ingredients', [{'id': 'abc', 'amount': 1}]),
+    ('ingredients', [{'id': 1, 'amount': 'много'}]),
+    ('ingredients', [{'amount': 1}]),
+    ('ingredients', [{'id': 1}]),
+    ('ingredients', [None]),
+    ('ingredients', 'мука'),
+    ('tags', ['abc']),
+    ('tags', [None]),
+    ('tags', 1),
+])
+def test_malformed_ids_are_rejected(user_client, payload, field, value):
+    payload[field] = value
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    assert field in response.json()
+    assert not Recipe.objects.exists()
+
+
+def test_non_positive_amount_is_rejected(user_client, payload):
+    payload['ingredients'][0]['amount'] = 0
+    response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 400
+    assert 'amount' in response.json()
+
+
+def test_replacing_ingredients_takes_constant_queries(
+        user, user_client, payload, make_recipe):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+        for number in range(60))
+    new = list(Ingredient.objects.filter(name__startswith='Ингредиент '))
+    recipe = make_recipe(user, amounts={
+        ingredient: 10 for ingredient in new[:30]})
+    Cart.objects.create(user=user, recipe=recipe)
+    payload['ingredients'] = [
+        {'id': ingredient.id, 'amount': 10} for ingredient in new[30:]]
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.patch(
+            f'/api/recipes/{recipe.id}/', payload, format='json')
+    assert response.status_code == 200, response.json()
+    # Число запросов не зависит от числа ингредиентов: без сигналов на
+    # каждую удалённую строку список покупок пересчитывается один раз.
+    assert len(context.captured_queries) <= 25
+    assert set(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient_id', flat=True)) == {
+            ingredient.id for ingredient in new[30:]}
+
+
+def test_update_touches_recipe_once(
+        user, user_client, payload, tags, ingredients, make_recipe):
+    recipe = make_recipe(user)
+    updated_at = recipe.updated_at
+    payload['tags'] = [tag.id for tag in tags[:2]]
+    payload['ingredients'] = [
+        {'id': ingredients[0].id, 'amount': 1},
+        {'id': ingredients[3].id, 'amount': 1},
+    ]
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.patch(
+            f'/api/recipes/{recipe.id}/', payload, format='json')
+    assert response.status_code == 200, response.json()
+    updates = [query['sql'] for query in context.captured_queries
+               if query['sql'].startswith('UPDATE "api_recipe"')]
+    # updated_at меняет только save() рецепта, а не каждая строка
+    # ингредиентов.
+    assert len(updates) == 1
+    recipe.refresh_from_db()
+    assert recipe.updated_at > updated_at
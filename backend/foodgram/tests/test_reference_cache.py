@@ -0,0 +1,44 @@
+from api.ingredient_index import IngredientIndex, ingredient_index
+from api.models import Ingredient, Tag
+from api.utils.cache import get_version
+
+
+def test_ingredient_index_is_invalidated_after_commit(
+        ingredients, django_capture_on_commit_callbacks):
+    assert ingredient_index.search('мед') == []
+    version = get_version(IngredientIndex.CACHE_NAME)
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        Ingredient.objects.create(name='Мёд', measurement_unit='г')
+        # Другие запросы ещё не видят строку: версия не должна меняться.
+        assert get_version(IngredientIndex.CACHE_NAME) == version
+    assert len(callbacks) == 1
+    assert get_version(IngredientIndex.CACHE_NAME) != version
+    assert [row['name'] for row in ingredient_index.search('мед')] == ['Мёд']
+
+
+def test_tags_response_is_invalidated_after_commit(
+        anon_client, tags, django_capture_on_commit_callbacks):
+    assert len(anon_client.get('/api/tags/').json()) == 3
+    version = get_version('tags')
+    with django_capture_on_commit_callbacks(execute=True):
+        Tag.objects.create(name='Десерт', color='#FF00FF')
+        assert get_version('tags') == version
+    assert get_version('tags') != version
+    names = [tag['name'] for tag in anon_client.get('/api/tags/').json()]
+    assert 'Десерт' in names
+
+
+def test_gzip_and_identity_responses_have_different_etags(
+        anon_client, tags):
+    plain = anon_client.get('/api/tags/')
+    compressed = anon_client.get('/api/tags/', HTTP_ACCEPT_ENCODING='gzip')
+    assert compressed['Content-Encoding'] == 'gzip'
+    assert plain['ETag'] != compressed['ETag']
+    response = anon_client.get(
+        '/api/tags/', HTTP_IF_NONE_MATCH=plain['ETag'],
+        HTTP_ACCEPT_ENCODING='gzip')
+    assert response.status_code == 200
+    response = anon_client.get(
+        '/api/tags/', HTTP_IF_NONE_MATCH=compressed['ETag'],
+        HTTP_ACCEPT_ENCODING='gzip')
+    assert response.status_code == 304
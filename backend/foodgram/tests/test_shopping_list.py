@@ -0,0 +1,51 @@
+import io
+
+from api.models import Cart, ShoppingListItem
+from django.core.management import call_command
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient_id', 'amount'))
+
+
+def test_rebuild_skips_recipe_without_ingredients(
+        user, author, ingredients, make_recipe):
+    empty = make_recipe(author, name='Без ингредиентов', amounts={})
+    full = make_recipe(
+        author, amounts={ingredients[0]: 100, ingredients[1]: 50})
+    Cart.objects.create(user=user, recipe=empty)
+    Cart.objects.create(user=user, recipe=full)
+    ShoppingListItem.objects.all().delete()
+    call_command('rebuild_shopping_lists', stdout=io.StringIO())
+    assert shopping_list(user) == {ingredients[0].id: 100,
+                                   ingredients[1].id: 50}
+
+
+def test_editing_carted_recipe_keeps_totals(
+        user, user_client, tags, ingredients, make_recipe):
+    recipe = make_recipe(user, amounts={
+        ingredient: 10 for ingredient in ingredients[:3]})
+    Cart.objects.create(user=user, recipe=recipe)
+    response = user_client.patch(f'/api/recipes/{recipe.id}/', {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'tags': [tags[0].id],
+        'ingredients': [
+            {'id': ingredients[0].id, 'amount': 20},
+            {'id': ingredients[1].id, 'amount': 10},
+            {'id': ingredients[3].id, 'amount': 10},
+        ],
+    }, format='json')
+    assert response.status_code == 200, response.json()
+    assert shopping_list(user) == {ingredients[0].id: 20,
+                                   ingredients[1].id: 10,
+                                   ingredients[3].id: 10}
+
+    amount = recipe.ingredientamount_set.get(ingredient=ingredients[1])
+    amount.amount = 30
+    amount.save()
+    assert shopping_list(user) == {ingredients[0].id: 20,
+                                   ingredients[1].id: 30,
+                                   ingredients[3].id: 10}
@@ -0,0 +1,88 @@
+import pytest
+from api import shopping_list as shopping_lists
+from api import user_recipes
+from api.models import Cart, Favorite, Recipe, ShoppingListItem
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient_id', 'amount'))
+
+
+@pytest.fixture
+def cart_recipes(author, ingredients, make_recipe):
+    return [
+        make_recipe(author, name='Первый',
+                    amounts={ingredients[0]: 100, ingredients[1]: 10}),
+        make_recipe(author, name='Второй', amounts={ingredients[0]: 50}),
+        make_recipe(author, name='Третий', amounts={ingredients[2]: 3}),
+    ]
+
+
+def counters(recipes, field):
+    return list(Recipe.objects.filter(
+        pk__in=[recipe.pk for recipe in recipes]
+    ).order_by('pk').values_list(field, flat=True))
+
+
+@pytest.mark.parametrize('url, model, field', [
+    ('/api/recipes/favorite/', Favorite, 'favorites_count'),
+    ('/api/recipes/shopping_cart/', Cart, 'carts_count'),
+])
+def test_bulk_remove_updates_counters(
+        user_client, user, cart_recipes, url, model, field):
+    ids = [recipe.id for recipe in cart_recipes]
+    response = user_client.post(url, {'recipes': ids}, format='json')
+    assert response.status_code == 201
+    assert counters(cart_recipes, field) == [1, 1, 1]
+    response = user_client.delete(
+        url, {'recipes': ids[:2]}, format='json')
+    assert response.json() == {'recipes': ids[:2]}
+    assert counters(cart_recipes, field) == [0, 0, 1]
+    assert list(model.objects.filter(user=user).values_list(
+        'recipe_id', flat=True)) == ids[2:]
+    # Повторное удаление ничего не меняет.
+    user_client.delete(url, {'recipes': ids[:2]}, format='json')
+    assert counters(cart_recipes, field) == [0, 0, 1]
+
+
+def test_bulk_remove_updates_shopping_list(
+        user_client, user, cart_recipes, ingredients):
+    ids = [recipe.id for recipe in cart_recipes]
+    user_client.post(
+        '/api/recipes/shopping_cart/', {'recipes': ids}, format='json')
+    assert shopping_list(user) == {
+        ingredients[0].id: 150, ingredients[1].id: 10, ingredients[2].id: 3}
+    user_client.delete(
+        '/api/recipes/shopping_cart/', {'recipes': ids[1:]}, format='json')
+    assert shopping_list(user) == {
+        ingredients[0].id: 100, ingredients[1].id: 10}
+
+
+def test_single_remove_updates_counters(user_client, user, cart_recipes):
+    recipe = cart_recipes[0]
+    url = f'/api/recipes/{recipe.id}/shopping_cart/'
+    assert user_client.post(url).status_code == 201
+    assert user_client.delete(url).status_code == 204
+    assert user_client.delete(url).status_code == 404
+    assert counters([recipe], 'carts_count') == [0]
+    assert shopping_list(user) == {}
+
+
+@pytest.mark.parametrize('function, name', [
+    (user_recipes.add_recipe, 'insert_pair'),
+    (user_recipes.remove_recipe, 'delete_pairs'),
+])
+def test_single_path_locks_user_first(
+        monkeypatch, user, cart_recipes, function, name):
+    """Порядок блокировок тот же, что в пакетных add_recipes и
+    remove_recipes."""
+    calls = []
+    for module, attr in ((shopping_lists, 'lock_users'), (user_recipes, name)):
+        original = getattr(module, attr)
+        monkeypatch.setattr(
+            module, attr,
+            lambda *args, original=original, attr=attr: (
+                calls.append(attr) or original(*args)))
+    function(Cart, user, cart_recipes[0].id)
+    assert calls[:2] == ['lock_users', name]
@@ -6,6 +6,7 @@ from .models import Follow, User
 class UserAdmin(admin.ModelAdmin):
     list_display = ('pk', 'username', 'first_name', 'last_name', 'email')
     list_filter = ('username', 'email')
+    search_fields = ('username', 'email')
 
 
 admin.site.register(User, UserAdmin)
@@ -0,0 +1,107 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from api.utils.cache import bump_version, get_version
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """Ограниченный LRU-кеш токен -> (пользователь, токен, версия)
+    с TTL."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            keys = [key for key, ((user, _, _), _) in self._entries.items()
+                    if user.pk == user_id]
+            for key in keys:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_AUTH_CACHE['MAX_SIZE'],
+    ttl=settings.TOKEN_AUTH_CACHE['TTL'],
+)
+
+
+def get_shared_key(key):
+    return f'auth_token:{key}'
+
+
+def invalidate_token(key):
+    """Сбрасывает токен во всех процессах: запись в LRU других
+    процессов перестаёт совпадать с версией в общем кеше."""
+    token_cache.delete(key)
+    transaction.on_commit(partial(bump_version, get_shared_key(key)))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД для недавно виденных токенов.
+
+    Сначала проверяется LRU-кеш процесса, затем (если включён) общий
+    кеш Django. Запись действительна, пока версия токена в общем кеше
+    не изменилась: сигналы меняют её при выходе из системы и изменении
+    пользователя. Так выход действует сразу во всех процессах, если
+    CACHES указывает на общий для них кеш (memcached); проверка версии
+    стоит одного обращения к кешу на запрос.
+    """
+
+    def authenticate_credentials(self, key):
+        version = get_version(get_shared_key(key))
+        entry = self.get_cached_entry(key, version)
+        if entry is None:
+            entry = (*super().authenticate_credentials(key), version)
+            token_cache.set(key, entry)
+            if settings.TOKEN_AUTH_CACHE['SHARED']:
+                cache.set(get_shared_key(key), entry, token_cache.ttl)
+        user, token, _ = entry
+        return copy.copy(user), token
+
+    @staticmethod
+    def get_cached_entry(key, version):
+        entry = token_cache.get(key)
+        if entry is None and settings.TOKEN_AUTH_CACHE['SHARED']:
+            entry = cache.get(get_shared_key(key))
+            if entry is not None and entry[2] == version:
+                token_cache.set(key, entry)
+        if entry is None or entry[2] != version:
+            return None
+        return entry
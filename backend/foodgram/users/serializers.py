@@ -1,8 +1,8 @@
+from api.fields import ImageVariantsField
 from api.models import Recipe
 from django.contrib.auth import get_user_model
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
 from .models import Follow
 
@@ -35,35 +35,6 @@ class UserSerializer(serializers.ModelSerializer):
             follower=follower, author=obj).exists()
 
 
-class FollowSerializer(serializers.ModelSerializer):
-    follower = serializers.SlugRelatedField(
-        slug_field='username',
-        read_only=True,
-        default=serializers.CurrentUserDefault(),)
-    author = serializers.SlugRelatedField(
-        slug_field='username', queryset=User.objects.all())
-
-    class Meta:
-        model = Follow
-        fields = '__all__'
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Follow.objects.all(),
-                fields=('author', 'follower'),
-                message='Вы уже подписаны на этого пользователя'
-            )
-        ]
-
-    def validate_author(self, data):
-        if data == self.context['request'].user:
-            raise serializers.ValidationError(
-                'Нельзя подписаться на самого себя')
-        return data
-
-
-User = get_user_model()
-
-
 class UserCreateSerializer(UserCreateSerializer):
 
     class Meta(UserCreateSerializer.Meta):
@@ -85,30 +56,11 @@ class UserSerializer(serializers.ModelSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return Follow.objects.filter(follower=user, author=obj).exists()
 
 
-class FollowSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        model = Follow
-        fields = '__all__'
-
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Follow.objects.all(),
-                fields=('author', 'follower'),
-                message='Вы уже подписаны на этого пользователя'
-            )
-        ]
-
-    def validate_author(self, data):
-        if data == self.context['request'].user:
-            raise serializers.ValidationError(
-                'Нельзя подписаться на самого себя')
-        return data
-
-
 class FollowerSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
@@ -126,28 +78,30 @@ class FollowerSerializer(UserSerializer):
             'is_subscribed', 'recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        limit = self.context.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if limit is not None:
-            queryset = Recipe.objects.filter(
-                author=obj.author
-            )[:int(limit)]
+        queryset = getattr(obj.author, 'subscription_recipes', None)
+        if queryset is None:
+            limit = self.context.get('recipes_limit')
+            queryset = Recipe.objects.filter(author=obj.author)
+            if limit is not None:
+                queryset = queryset[:int(limit)]
 
         return FavoriteRecipeSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj.author).count()
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return Follow.objects.filter(
-            follower=obj.follower, author=obj.author
-        ).exists()
+        return obj.follower_id == request.user.id
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
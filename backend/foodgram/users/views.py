@@ -1,13 +1,18 @@
+from api.models import Recipe
+from api.utils.db import insert_pair
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
 from .models import Follow
 from .paginator import Paginator
-from .serializers import FollowerSerializer, FollowSerializer, UserSerializer
+from .serializers import FollowerSerializer, UserSerializer
 
 User = get_user_model()
 
@@ -23,41 +28,76 @@ class UserViewSet(UserViewSet):
         serializer = self.get_serializer(user)
         return Response(serializer.data)
 
+    @staticmethod
+    def get_follow_queryset(follower):
+        return Follow.objects.filter(follower=follower).select_related(
+            'author').annotate(
+            recipes_count=Count('author__recipes')).order_by('-id')
+
+    @staticmethod
+    def prefetch_author_recipes(follows, recipes_limit):
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time', 'author')
+        if recipes_limit is not None:
+            recipes = recipes.filter(
+                author__in=[follow.author_id for follow in follows]
+            ).latest_per_author(recipes_limit)
+        prefetch_related_objects(follows, Prefetch(
+            'author__recipes', queryset=recipes,
+            to_attr='subscription_recipes'))
+        return follows
+
+    @staticmethod
+    def get_recipes_limit(request):
+        recipes_limit = request.GET.get('recipes_limit', default=None)
+        if recipes_limit is None or not recipes_limit.isdigit():
+            return None
+        return int(recipes_limit)
+
     @action(detail=False, permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
-        queryset = Follow.objects.filter(follower=request.user)
-        page = self.paginate_queryset(queryset)
-        recipes_limit = request.GET.get('recipes_limit', default=None)
+        queryset = self.get_follow_queryset(request.user)
+        recipes_limit = self.get_recipes_limit(request)
+        page = self.prefetch_author_recipes(
+            self.paginate_queryset(queryset), recipes_limit)
         serializer = FollowerSerializer(
-            page, many=True, context={'recipes_limit': recipes_limit}
+            page, many=True,
+            context={'request': request, 'recipes_limit': recipes_limit}
         )
         return self.get_paginated_response(serializer.data)
 
+    @staticmethod
+    def get_author_id(id):
+        if not str(id).isdigit():
+            raise NotFound()
+        return int(id)
+
     @action(detail=True, methods=['POST'],
             permission_classes=[permissions.IsAuthenticated])
     def subscribe(self, request, id=None):
         follower = request.user
-        author = get_object_or_404(User, id=id)
-        data = {
-            'follower': follower.id,
-            'author': author.id
-        }
-        serializer = FollowSerializer(
-            data=data, context={'request': request}, partial=True
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        queryset = Follow.objects.filter(follower=request.user, author=author)
+        author_id = self.get_author_id(id)
+        if not insert_pair(Follow, 'follower', follower.id,
+                           'author', author_id, exclude_self=True):
+            author = get_object_or_404(User, id=author_id)
+            if author == follower:
+                raise ValidationError(
+                    {'author': ['Нельзя подписаться на самого себя']})
+            raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+                'Вы уже подписаны на этого пользователя']})
+        queryset = self.prefetch_author_recipes(
+            list(self.get_follow_queryset(follower).filter(
+                author_id=author_id)),
+            self.get_recipes_limit(request))
         serializer = FollowerSerializer(
             queryset, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def delete_subscribe(self, request, id=None):
-        follower = request.user
-        author = get_object_or_404(User, id=id)
-        subscribe = get_object_or_404(
-            Follow, follower=follower, author=author
-        )
-        subscribe.delete()
+        deleted, _ = Follow.objects.filter(
+            follower=request.user, author_id=self.get_author_id(id)
+        ).delete()
+        if not deleted:
+            raise NotFound()
         return Response(status=status.HTTP_204_NO_CONTENT)